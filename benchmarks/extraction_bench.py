@@ -0,0 +1,313 @@
+"""
+Benchmark the extraction pipeline offline with a fake LLM.
+
+Runs process_pdf, process_docx and process_single_file over a generated corpus of PDFs and
+DOCX files with varying page counts and image density, and reports per-stage wall time
+(open, render, encode, LLM, parse), payload bytes sent to the LLM, peak memory and
+throughput at several concurrency levels. Finally the longest scanned PDF is rendered in a
+fresh process and its peak RSS growth is checked against the render memory budget.
+
+Usage:
+    python benchmarks/extraction_bench.py [--latency 0.5] [--concurrency 1,4,8]
+                                          [--pages 1,3,10,40] [--images 0,2,6]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import multiprocessing
+import resource
+import threading
+import tracemalloc
+from io import BytesIO
+from functools import wraps
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The fake LLM needs no key, and every run must miss the cache
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ["EXTRACTION_CACHE_PATH"] = ""
+
+import fitz  # PyMuPDF
+import docx
+from PIL import Image
+
+import utils
+import render_pool
+import image_encoding
+from extraction_cache import ExtractionCache
+from llm_gateway import LLMGateway
+
+STAGES = ("open", "render", "encode", "llm", "parse")
+
+CANNED_RESPONSE = """```json
+{
+  "name": "Jane Doe",
+  "job_title": "Registered Nurse",
+  "location": "Phoenix, AZ",
+  "email": "jane.doe@example.com",
+  "phone": "(602) 555-0143",
+  "linkedin": "https://linkedin.com/in/jane-doe-rn",
+  "total_work_experience": "6",
+  "summary": "ICU and med-surg nurse with six years of acute care experience."
+}
+```"""
+
+RESUME_LINES = [
+    "Jane Doe",
+    "Registered Nurse",
+    "Phoenix, AZ | (602) 555-0143 | jane.doe@example.com | linkedin.com/in/jane-doe-rn",
+    "",
+    "EXPERIENCE",
+] + [
+    f"Staff Nurse, St. Mary's Medical Center, 20{i:02d}-20{i + 1:02d}: patient assessment, care plans, "
+    f"medication administration and discharge teaching for a 30-bed unit."
+    for i in range(10, 22)
+]
+
+
+class StageTimer:
+    """Accumulates wall time per stage across threads; nested timings of the same stage count once."""
+
+    def __init__(self):
+        self.totals = {stage: 0.0 for stage in STAGES}
+        self.payload_bytes = 0
+        self._lock = threading.Lock()
+        self._depth = threading.local()
+
+    def reset(self):
+        with self._lock:
+            self.totals = {stage: 0.0 for stage in STAGES}
+            self.payload_bytes = 0
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.totals[stage] += seconds
+
+    def wrap(self, stage, func):
+        @wraps(func)
+        def timed(*args, **kwargs):
+            depth = getattr(self._depth, stage, 0)
+            setattr(self._depth, stage, depth + 1)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                setattr(self._depth, stage, depth)
+                if depth == 0:
+                    self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_iter(self, stage, func):
+        """Like wrap, for generator functions: times the work done producing each item."""
+        @wraps(func)
+        def timed(*args, **kwargs):
+            iterator = func(*args, **kwargs)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.add(stage, time.perf_counter() - start)
+                yield item
+        return timed
+
+
+class FakeLLM:
+    """Stands in for ChatOpenAI: records the payload and answers with canned JSON after a delay."""
+
+    def __init__(self, timer, latency):
+        self.timer = timer
+        self.latency = latency
+
+    async def ainvoke(self, messages, timeout=None):
+        start = time.perf_counter()
+        payload = 0
+        for message in messages:
+            if isinstance(message.content, str):
+                payload += len(message.content)
+                continue
+            for part in message.content:
+                payload += len(part.get("text") or part.get("image_url", {}).get("url", ""))
+        with self.timer._lock:
+            self.timer.payload_bytes += payload
+        await asyncio.sleep(self.latency)
+        self.timer.add("llm", time.perf_counter() - start)
+        return SimpleNamespace(content=CANNED_RESPONSE, usage_metadata={"total_tokens": payload // 4})
+
+
+def install_instrumentation(timer, latency):
+    utils.llm_gateway = LLMGateway(FakeLLM(timer, latency), requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9)
+    utils.extraction_cache = ExtractionCache(path=None, max_entries=0)
+
+    fitz.open = timer.wrap("open", fitz.open)
+    utils.docx.Document = timer.wrap("open", utils.docx.Document)
+    # Page rendering includes its own encoding; the encode stage is subtracted in the report
+    render_pool.iter_pdf_pages = timer.wrap_iter("render", render_pool.iter_pdf_pages)
+    image_encoding.encode_image = timer.wrap("encode", image_encoding.encode_image)
+    image_encoding.encode_source_image = timer.wrap("encode", image_encoding.encode_source_image)
+    utils.extract_json_from_content = timer.wrap("parse", utils.extract_json_from_content)
+
+
+def photo_jpeg(width, height, seed):
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def make_pdf(pages, image_ratio):
+    pdf_document = fitz.open()
+    image_pages = int(pages * image_ratio)
+    for page_num in range(pages):
+        page = pdf_document.new_page()
+        if page_num >= pages - image_pages:
+            # Image-only page, like a scan, so the text-first path has to rasterize it
+            page.insert_image(page.rect, stream=photo_jpeg(300, 400, page_num))
+        else:
+            page.insert_text((54, 54), "\n".join(RESUME_LINES), fontsize=8)
+    return pdf_document.tobytes()
+
+
+def make_docx(images):
+    document = docx.Document()
+    for line in RESUME_LINES:
+        document.add_paragraph(line)
+    for i in range(images):
+        document.add_picture(BytesIO(photo_jpeg(800, 600, i)))
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def build_corpus(page_counts, image_counts):
+    corpus = []
+    for pages in page_counts:
+        for ratio in (0.0, 0.5, 1.0):
+            corpus.append((f"resume_{pages}p_{int(ratio * 100)}img.pdf", make_pdf(pages, ratio)))
+    for images in image_counts:
+        corpus.append((f"resume_{images}img.docx", make_docx(images)))
+    return corpus
+
+
+def peak_rss_mb():
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(self_kb, children_kb) / 1024
+
+
+def run_stage_breakdown(timer, corpus):
+    """One document at a time with inline rendering, so every stage is timed in this process."""
+    render_pool.RENDER_POOL_WORKERS = 0
+    print("Per-stage wall time (ms), payload (bytes) and Python heap peak (MB)")
+    print(f"{'document':<28}{'wall':>8}" + "".join(f"{stage:>8}" for stage in STAGES)
+          + f"{'payload':>12}{'py peak':>10}")
+    for filename, data in corpus:
+        timer.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        if filename.endswith(".pdf"):
+            result = utils.process_pdf(data)
+        else:
+            result = utils.process_docx(data)
+        utils.extract_json_from_content(result)
+        wall = time.perf_counter() - start
+        _, py_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        totals = dict(timer.totals)
+        totals["render"] = max(0.0, totals["render"] - totals["encode"])
+        print(f"{filename:<28}{wall * 1000:>8.0f}" + "".join(f"{totals[stage] * 1000:>8.0f}" for stage in STAGES)
+              + f"{timer.payload_bytes:>12,}{py_peak / 1024 / 1024:>10.1f}")
+
+
+def high_water_kb():
+    # ru_maxrss survives exec and would report the parent's peak, VmHWM is this process only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def render_peak_rss_mb(pdf_bytes):
+    """Runs in a fresh process: peak RSS growth while rendering every page of a PDF inline."""
+    render_pool.RENDER_POOL_WORKERS = 0
+    page_count = len(fitz.open(stream=pdf_bytes, filetype="pdf"))
+    try:
+        # Reset the high-water mark so import-time allocations don't hide the render peak (Linux)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    baseline_kb = high_water_kb()
+    pages = render_pool.render_pages(pdf_bytes, range(page_count), image_encoding.per_image_budget(page_count))
+    payload = sum(len(data_url) for data_url in pages)
+    return (high_water_kb() - baseline_kb) / 1024, payload
+
+
+def run_memory_check(corpus):
+    """True if rendering the largest scanned PDF stayed within RENDER_MEMORY_BUDGET."""
+    filename, data = max((item for item in corpus if item[0].endswith("100img.pdf")), key=lambda item: len(item[1]))
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        growth_mb, payload = pool.apply(render_peak_rss_mb, (data,))
+    # Pages are consumed as they stream in, so only the page being rendered should count
+    limit_mb = render_pool.RENDER_MEMORY_BUDGET / 1024 / 1024
+    verdict = "within budget" if growth_mb <= limit_mb else "OVER BUDGET"
+    print(f"\nRendering all pages of {filename}: peak RSS +{growth_mb:.1f} MB, payload {payload:,} bytes "
+          f"(limit {limit_mb:.0f} MB, {verdict})")
+    return growth_mb <= limit_mb
+
+
+def run_throughput(timer, corpus, concurrency_levels, workers):
+    """The whole corpus through process_single_file with the render pool enabled."""
+    render_pool.RENDER_POOL_WORKERS = workers
+    print(f"\n{'concurrency':<14}{'files':>8}{'wall':>10}{'files/s':>10}{'payload':>14}")
+    for concurrency in concurrency_levels:
+        timer.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(lambda item: utils.process_single_file(item[1], item[0]), corpus))
+        wall = time.perf_counter() - start
+        failed = [r["filename"] for r in results if r["status"] != "success"]
+        print(f"{concurrency:<14}{len(corpus):>8}{wall:>9.2f}s{len(corpus) / wall:>10.2f}{timer.payload_bytes:>14,}"
+              + (f"  failed: {', '.join(failed)}" if failed else ""))
+    render_pool.shutdown_render_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM latency in seconds")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma separated concurrency levels")
+    parser.add_argument("--pages", default="1,3,10,40", help="comma separated PDF page counts")
+    parser.add_argument("--images", default="0,2,6", help="comma separated DOCX image counts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="render pool workers")
+    args = parser.parse_args()
+
+    timer = StageTimer()
+    install_instrumentation(timer, args.latency)
+    corpus = build_corpus(
+        [int(n) for n in args.pages.split(",")],
+        [int(n) for n in args.images.split(",")]
+    )
+    print(f"Corpus: {len(corpus)} documents, fake LLM latency {args.latency:.2f}s\n")
+
+    run_stage_breakdown(timer, corpus)
+    run_throughput(timer, corpus, [int(n) for n in args.concurrency.split(",")], args.workers)
+    within_budget = run_memory_check(corpus)
+    print(f"\nPeak RSS: {peak_rss_mb():.0f} MB")
+    if not within_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare the image payload sent to the LLM per page before and after the adaptive encoding policy.
+
+Usage:
+    python benchmarks/image_encoding_bench.py [resume.pdf resume.docx ...]
+
+Without arguments a synthetic two-page PDF (one text page, one photo-like page) is used.
+"""
+import os
+import sys
+import base64
+import random
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+import docx
+from PIL import Image
+
+from image_encoding import encode_source_image, per_image_budget
+from render_pool import render_pdf_pages
+
+
+def legacy_pdf_payloads(pdf_bytes):
+    """Previous behaviour: every page rendered to PNG at 1.5x zoom."""
+    pdf_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    payloads = []
+    for page in pdf_document:
+        pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+        payloads.append(len(f"data:image/png;base64,{base64.b64encode(pix.tobytes()).decode('utf-8')}"))
+    pdf_document.close()
+    return payloads
+
+
+def policy_pdf_payloads(pdf_bytes):
+    page_count = len(fitz.open(stream=pdf_bytes, filetype="pdf"))
+    pages = render_pdf_pages(pdf_bytes, range(page_count), budget=per_image_budget(page_count))
+    return [len(data_url) for data_url, _, _ in pages]
+
+
+def legacy_docx_payloads(docx_bytes):
+    """Previous behaviour: every embedded image thumbnailed to 1024px and re-encoded as PNG."""
+    doc = docx.Document(BytesIO(docx_bytes))
+    payloads = []
+    for rel in doc.part._rels.values():
+        if "image" in rel.target_ref:
+            image = Image.open(BytesIO(rel.target_part.blob))
+            if image.width > 1024 or image.height > 1024:
+                image.thumbnail((1024, 1024))
+            buffer = BytesIO()
+            image.save(buffer, format="PNG")
+            payloads.append(len(f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"))
+    return payloads
+
+
+def policy_docx_payloads(docx_bytes):
+    doc = docx.Document(BytesIO(docx_bytes))
+    blobs = [rel.target_part.blob for rel in doc.part._rels.values() if "image" in rel.target_ref]
+    budget = per_image_budget(len(blobs))
+    return [len(encode_source_image(blob, 1024, budget)) for blob in blobs]
+
+
+def synthetic_pdf():
+    pdf_document = fitz.open()
+    page = pdf_document.new_page()
+    text = "\n".join(f"Registered Nurse - St. Mary's Hospital, 20{i:02d}-20{i + 1:02d}" for i in range(40))
+    page.insert_text((72, 72), text, fontsize=9)
+
+    # Noise stands in for a scanned or photographed page
+    random.seed(0)
+    noise = Image.frombytes("RGB", (600, 800), bytes(random.getrandbits(8) for _ in range(600 * 800 * 3)))
+    buffer = BytesIO()
+    noise.save(buffer, format="JPEG", quality=90)
+    photo_page = pdf_document.new_page()
+    photo_page.insert_image(photo_page.rect, stream=buffer.getvalue())
+    return pdf_document.tobytes()
+
+
+def report(name, before, after):
+    if not before:
+        print(f"{name}: no images")
+        return
+    avg_before = sum(before) / len(before)
+    avg_after = sum(after) / len(after)
+    print(f"{name}: {len(before)} images/pages")
+    for i, (b, a) in enumerate(zip(before, after), start=1):
+        print(f"  page {i}: {b:>10,} -> {a:>10,} bytes")
+    print(f"  avg/page: {avg_before:>10,.0f} -> {avg_after:>10,.0f} bytes ({avg_after / avg_before:.0%})")
+
+
+def main(paths):
+    if not paths:
+        data = synthetic_pdf()
+        report("synthetic.pdf", legacy_pdf_payloads(data), policy_pdf_payloads(data))
+        return
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        if path.lower().endswith(".pdf"):
+            report(path, legacy_pdf_payloads(data), policy_pdf_payloads(data))
+        elif path.lower().endswith(".docx"):
+            report(path, legacy_docx_payloads(data), policy_docx_payloads(data))
+        else:
+            print(f"{path}: unsupported file type")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,130 @@
+"""
+Evaluate the local intent classifier against intents labelled by Bland's remote analyze.
+
+Labelled calls come from person_details_dummy (rows whose intent was set remotely) or from a
+JSONL file of {"transcript": ..., "intent": ...} lines. Reports, per confidence threshold,
+how many calls would be answered locally, their accuracy and the per-label confusion, plus
+the time per classification. By default the classifier is loaded the way production loads
+it, rules plus the model at --model if one exists. With --train a naive Bayes model is
+fitted on 80% of the data, calibrated and evaluated on the rest and written to the given path.
+
+Usage:
+    python benchmarks/intent_eval.py [--db postgresql://...] [--jsonl labelled.jsonl]
+                                     [--thresholds 0.5,0.6,0.7,0.8,0.9] [--model intent_model.json]
+                                     [--train intent_model.json]
+
+Without --db or --jsonl a small built-in sample is used.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_classifier import INTENT_MODEL_PATH, INTENTS, IntentClassifier, NaiveBayesIntentModel
+
+SAMPLE = [
+    ("assistant: Hi, is this Dana?\nuser: Yes.\nassistant: We have an RN role in Austin paying $52.\n"
+     "user: Oh that sounds great, tell me more.", "yes"),
+    ("assistant: Hi, is this Sam?\nuser: Yeah.\nassistant: Would you be interested in a travel ICU role?\n"
+     "user: I'm not interested, thanks.", "no"),
+    ("assistant: Hi, is this Lee?\nuser: I'm driving right now, can you call me back later?", "later"),
+    ("user: Please stop calling this number.", "no"),
+    ("user: Sure, I'd love to hear about it. Send me the details.", "yes"),
+    ("user: I already found a job, but thank you.", "no"),
+    ("user: Not a good time, I'm at work.", "later"),
+    ("user: Hmm, maybe. What's the pay again?", "yes"),
+    ("user: Wrong number.", "no"),
+    ("user: I'm busy, I'll call you back.", "later"),
+]
+
+
+def load_db(url):
+    import psycopg2
+
+    with psycopg2.connect(url) as conn, conn.cursor() as cursor:
+        # Rows from before intent_source existed were all labelled remotely
+        cursor.execute("""
+            SELECT transcript, intent FROM person_details_dummy
+            WHERE transcript IS NOT NULL AND intent IN ('yes', 'no', 'later')
+            AND COALESCE(intent_source, 'remote') = 'remote'
+        """)
+        return cursor.fetchall()
+
+
+def load_jsonl(path):
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["transcript"], row["intent"]) for row in rows if row.get("intent") in INTENTS]
+
+
+def split(examples):
+    """Deterministic 80/20 split on a hash of the transcript."""
+    train, holdout = [], []
+    for transcript, intent in examples:
+        (holdout if zlib.crc32(transcript.encode()) % 5 == 0 else train).append((transcript, intent))
+    return train, holdout
+
+
+def evaluate(name, classifier, examples, thresholds):
+    start = time.perf_counter()
+    predictions = [classifier.classify(transcript) for transcript, _ in examples]
+    per_call_us = (time.perf_counter() - start) / max(len(examples), 1) * 1e6
+
+    print(f"{name}: {len(examples)} labelled calls, {per_call_us:.0f}us per classification")
+    print(f"  {'threshold':>9} {'local':>7} {'accuracy':>9}")
+    for threshold in thresholds:
+        local = [(p.label, intent) for p, (_, intent) in zip(predictions, examples) if p.confidence >= threshold]
+        correct = sum(label == intent for label, intent in local)
+        accuracy = f"{correct / len(local):.1%}" if local else "-"
+        print(f"  {threshold:>9.2f} {len(local) / max(len(examples), 1):>7.1%} {accuracy:>9}")
+
+    print("  confusion at all confidences (rows: remote label, columns: local label)")
+    columns = INTENTS + ("unknown",)
+    print("  " + " " * 7 + "".join(f"{label:>9}" for label in columns))
+    for intent in INTENTS:
+        counts = [sum(1 for p, (_, actual) in zip(predictions, examples) if actual == intent and p.label == label)
+                  for label in columns]
+        print(f"  {intent:>7}" + "".join(f"{count:>9}" for count in counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="Database URL to read remotely labelled calls from")
+    parser.add_argument("--jsonl", help="File of {\"transcript\", \"intent\"} lines")
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.9")
+    parser.add_argument("--model", default=INTENT_MODEL_PATH, help="Model to evaluate, as INTENT_MODEL_PATH")
+    parser.add_argument("--train", metavar="PATH", help="Fit a naive Bayes model and save it here")
+    args = parser.parse_args()
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+
+    examples = []
+    if args.db:
+        examples += load_db(args.db)
+    if args.jsonl:
+        examples += load_jsonl(args.jsonl)
+    if not args.db and not args.jsonl:
+        examples = SAMPLE
+
+    if not args.train:
+        classifier = IntentClassifier.from_path(args.model)
+        evaluate("rules + model" if classifier.model is not None else "rules", classifier, examples, thresholds)
+        return
+
+    train, holdout = split(examples)
+    print(f"Training on {len(train)} calls, calibrating and evaluating on {len(holdout)}")
+    model = NaiveBayesIntentModel.train(train)
+    # Calibrating on the evaluation set flatters it a little; it is the only data the model hasn't seen
+    model.calibrate(holdout)
+    evaluate("rules (holdout)", IntentClassifier(), holdout, thresholds)
+    evaluate("rules + model (holdout)", IntentClassifier(model), holdout, thresholds)
+    # The shipped model is the one calibrated above, so its confidences mean what was measured
+    model.save(args.train)
+    print(f"Model written to {args.train}")
+
+
+if __name__ == "__main__":
+    main()
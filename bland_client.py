@@ -0,0 +1,95 @@
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BLAND_CALLS_URL = os.getenv("BLAND_CALLS_URL", "https://api.bland.ai/v1/calls")
+# Seconds to wait on the Bland API before giving up on a request
+BLAND_TIMEOUT = float(os.getenv("BLAND_TIMEOUT", "30"))
+# Connections kept open to the Bland API, shared by every request from this process
+BLAND_MAX_CONNECTIONS = int(os.getenv("BLAND_MAX_CONNECTIONS", "20"))
+BLAND_KEEPALIVE_SECONDS = float(os.getenv("BLAND_KEEPALIVE_SECONDS", "60"))
+
+try:
+    import h2  # noqa: F401  HTTP/2 is only negotiated when the h2 package is installed
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class BlandClient:
+    """
+    Pooled client for the Bland calls API.
+
+    One sync and one async httpx client are created lazily and reused, so calls share
+    kept-alive connections instead of paying a TLS handshake each. Scheduler threads use
+    the plain methods, request handlers the a-prefixed coroutines.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, calls_url: Optional[str] = None,
+                 timeout: float = BLAND_TIMEOUT, max_connections: int = BLAND_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.calls_url = (calls_url or BLAND_CALLS_URL).rstrip("/")
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=BLAND_KEEPALIVE_SECONDS
+        )
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        # Read at request time so a key loaded from .env after import still applies
+        api_key = self.api_key or os.getenv("BLAND_API_KEY")
+        return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    def _sync(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits, http2=HTTP2_AVAILABLE)
+            return self._client
+
+    def _async(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits, http2=HTTP2_AVAILABLE)
+            return self._async_client
+
+    def start_call(self, payload: Dict[str, Any]) -> httpx.Response:
+        return self._sync().post(self.calls_url, json=payload, headers=self.headers)
+
+    def analyze_call(self, call_id: str, payload: Dict[str, Any]) -> httpx.Response:
+        return self._sync().post(f"{self.calls_url}/{call_id}/analyze", json=payload, headers=self.headers)
+
+    def get_call(self, call_id: str) -> httpx.Response:
+        return self._sync().get(f"{self.calls_url}/{call_id}", headers=self.headers)
+
+    async def astart_call(self, payload: Dict[str, Any]) -> httpx.Response:
+        return await self._async().post(self.calls_url, json=payload, headers=self.headers)
+
+    async def aanalyze_call(self, call_id: str, payload: Dict[str, Any]) -> httpx.Response:
+        return await self._async().post(f"{self.calls_url}/{call_id}/analyze", json=payload, headers=self.headers)
+
+    async def aget_call(self, call_id: str) -> httpx.Response:
+        return await self._async().get(f"{self.calls_url}/{call_id}", headers=self.headers)
+
+    async def aclose(self):
+        """Close both connection pools; call from the app's shutdown hook."""
+        with self._lock:
+            client, async_client = self._client, self._async_client
+            self._client = self._async_client = None
+        if client is not None:
+            client.close()
+        if async_client is not None:
+            await async_client.aclose()
+        logger.info("Bland client connections closed")
+
+
+bland_client = BlandClient()
@@ -14,3 +14,26 @@ Your output must always be in the following JSON format:
   "summary": "<Work Experience Summary like what you would find in a resume>",
 }
 """
+
+# Fields SYSTEM_PROMPT asks for, keyed by the normalized result key: (prompt key, description)
+EXTRACTION_FIELDS = {
+    "full_name": ("name", "<Full Name>"),
+    "job_title": ("job_title", "<Current or Most Recent Job Title>"),
+    "location": ("location", "<City, State/Country if available>"),
+    "email": ("email", "<Email Address if available>"),
+    "phone_number": ("phone", "<Phone Number if available>"),
+    "linkedin": ("linkedin", "<LinkedIn Profile URL if available>"),
+    "total_work_experience": ("total_work_experience", "<Calculated Total Work Experience in years>"),
+    "summary": ("summary", "<Work Experience Summary like what you would find in a resume>"),
+}
+
+# Used when contact fields were already extracted locally and only the rest needs the LLM
+REDUCED_SYSTEM_PROMPT = """
+You are an intelligent information extraction assistant specialized in analyzing images of resumes, profiles, and professional documents. Your task is to extract structured data from the image OCR result (text content extracted from image).
+
+Only extract the fields listed below, the remaining fields have already been extracted.
+Your output must always be in the following JSON format:
+```json
+{fields}
+```
+"""
@@ -0,0 +1,96 @@
+import re
+import json
+from typing import Dict, Iterable, List, Optional
+
+from config import EXTRACTION_FIELDS, REDUCED_SYSTEM_PROMPT, SYSTEM_PROMPT
+
+# Fields the local extractor can fill; everything else needs the LLM
+CONTACT_FIELDS = ("full_name", "email", "phone_number", "linkedin")
+# Bump whenever the rules below change what they extract; cached extractions are keyed on it
+CONTACT_RULES_VERSION = "2"
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}")
+# Separators stay on one line; a newline between digit groups is never a phone number
+PHONE_PATTERN = re.compile(r"(?<![\w/])(?:\+\d{1,3}[ .\-]?)?(?:\(\d{2,4}\) ?|\d{2,4}[ .\-]?)\d{3,4}[ .\-]?\d{3,4}(?![\w/])")
+YEAR_PATTERN = re.compile(r"^(19|20)\d\d$")
+LINKEDIN_PATTERN = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/(?:in|pub)/[A-Za-z0-9\-_%]+/?", re.IGNORECASE)
+NAME_TOKEN_PATTERN = re.compile(r"^[A-Z][A-Za-z'\-]*\.?$")
+NOT_NAME_WORDS = {
+    "resume", "curriculum", "vitae", "cv", "profile", "summary", "contact", "experience",
+    "education", "skills", "objective", "registered", "nurse", "page"
+}
+# Lines searched for the name, from the top of the document
+NAME_SEARCH_LINES = 5
+
+
+def _find_phone(text: str) -> Optional[str]:
+    for match in PHONE_PATTERN.finditer(text):
+        digits = re.sub(r"\D", "", match.group())
+        groups = re.findall(r"\d+", match.group())
+        # Dates have too few digits to pass; runs of years like "2015 2016 2017" are skipped
+        if 10 <= len(digits) <= 15 and not all(YEAR_PATTERN.match(group) for group in groups):
+            return match.group().strip()
+    return None
+
+
+def _name_matches_email(tokens: List[str], email: str) -> bool:
+    """jane.doe@, doe.jane@, jdoe@, janedoe42@ all corroborate "Jane Doe"."""
+    local = re.sub(r"[^a-z]", "", email.split("@")[0].lower())
+    first, last = (re.sub(r"[^a-z]", "", token.lower()) for token in (tokens[0], tokens[-1]))
+    if len(last) < 2 or last not in local:
+        return False
+    return first in local or local.startswith(first[:1]) or local.endswith(first[:1])
+
+
+def _find_name(text: str, email: Optional[str]) -> Optional[str]:
+    """
+    A name is only trusted when one of the first lines is nothing but 2-4 capitalised words
+    (credentials after a comma aside) and its first and last names are in the email address.
+    Headings, job titles and cities look the same, so without that the LLM decides.
+    """
+    if not email:
+        return None
+    lines = [line.strip() for line in text.splitlines() if line.strip()][:NAME_SEARCH_LINES]
+    for line in lines:
+        # "Jane Doe, RN" or "Jane Doe, MSN, RN"
+        candidate = line.split(",")[0].strip()
+        tokens = candidate.split()
+        if not 2 <= len(tokens) <= 4:
+            continue
+        if any(token.lower().strip(".") in NOT_NAME_WORDS for token in tokens):
+            continue
+        if all(NAME_TOKEN_PATTERN.match(token) for token in tokens) and _name_matches_email(tokens, email):
+            return candidate.title() if candidate.isupper() else candidate
+    return None
+
+
+def extract_contact_fields(text: str) -> Dict[str, str]:
+    """Pull contact fields out of a document's text layer; fields that aren't found are left out."""
+    fields = {}
+    email = EMAIL_PATTERN.search(text)
+    if email:
+        fields["email"] = email.group()
+    phone = _find_phone(text)
+    if phone:
+        fields["phone_number"] = phone
+    linkedin = LINKEDIN_PATTERN.search(text)
+    if linkedin:
+        url = linkedin.group().rstrip("/")
+        fields["linkedin"] = url if url.lower().startswith("http") else f"https://{url}"
+    name = _find_name(text, fields.get("email"))
+    if name:
+        fields["full_name"] = name
+    return fields
+
+
+def missing_fields(local_fields: Dict[str, str], requested: Optional[Iterable[str]] = None) -> List[str]:
+    requested = list(requested) if requested else list(EXTRACTION_FIELDS)
+    return [field for field in requested if field in EXTRACTION_FIELDS and field not in local_fields]
+
+
+def build_system_prompt(fields: List[str]) -> str:
+    """Full SYSTEM_PROMPT when every field is needed, otherwise a prompt for just the given fields."""
+    if set(fields) >= set(EXTRACTION_FIELDS):
+        return SYSTEM_PROMPT
+    schema = {EXTRACTION_FIELDS[field][0]: EXTRACTION_FIELDS[field][1] for field in fields}
+    return REDUCED_SYSTEM_PROMPT.format(fields=json.dumps(schema, indent=2))
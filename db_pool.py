@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import psycopg2
+from psycopg2 import pool
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open, and the most handed out at once
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections idle longer than this are pinged before reuse; Neon drops idle sessions
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "3"))
+
+# Errors that mean the connection itself is unusable and must not go back in the pool
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool with a context-manager API.
+
+    Connections are opened lazily up to max_size, checked on checkout (closed ones are
+    replaced, long-idle ones pinged) and committed or rolled back when the block exits.
+    Checkout blocks while all connections are in use instead of failing.
+    """
+
+    def __init__(self, dsn: str, min_size: int = DB_POOL_MIN, max_size: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT, **connect_kwargs):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self._pool: Optional[pool.ThreadedConnectionPool] = None
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> pool.ThreadedConnectionPool:
+        with self._lock:
+            if self._pool is None:
+                self._pool = pool.ThreadedConnectionPool(self.min_size, self.max_size, self.dsn, **self.connect_kwargs)
+                logger.info(f"Database pool opened ({self.min_size}-{self.max_size} connections)")
+            return self._pool
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # Connections that were never handed out were just opened
+        if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._get_pool().putconn(conn, close=True)
+
+    def _checkout(self):
+        for attempt in range(DB_CONNECT_RETRIES):
+            try:
+                conn = self._get_pool().getconn()
+            except CONNECTION_ERRORS as e:
+                if attempt == DB_CONNECT_RETRIES - 1:
+                    raise
+                logger.warning(f"Database connection failed, retrying ({attempt + 1}/{DB_CONNECT_RETRIES}): {e}")
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            if self._healthy(conn):
+                return conn
+            logger.warning("Discarding dead pooled database connection")
+            self._discard(conn)
+        # Every pooled connection was stale; a fresh one comes straight from getconn
+        return self._get_pool().getconn()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; the transaction commits on success and rolls back on error."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pool.PoolError(f"No database connection free after {self.timeout:.0f}s")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except CONNECTION_ERRORS:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        except BaseException:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn, close=conn.closed)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self, cursor_factory=None):
+        """Shortcut for a single cursor inside its own pooled transaction."""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+                logger.info("Database pool closed")
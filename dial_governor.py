@@ -0,0 +1,121 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Dials per second this process starts at, and the range AIMD moves it within.
+# Limits are per process; divide by the number of dial workers when running several.
+DIAL_RATE = float(os.getenv("DIAL_RATE", "2"))
+DIAL_RATE_MIN = float(os.getenv("DIAL_RATE_MIN", "0.2"))
+DIAL_RATE_MAX = float(os.getenv("DIAL_RATE_MAX", "10"))
+# Added to the rate per successful dial; halved on a 429, 5xx or transport error
+DIAL_RATE_STEP = float(os.getenv("DIAL_RATE_STEP", "0.05"))
+DIAL_RATE_BACKOFF = float(os.getenv("DIAL_RATE_BACKOFF", "0.5"))
+# Dials allowed back to back after an idle spell
+DIAL_BURST = float(os.getenv("DIAL_BURST", "2"))
+# Requests to /v1/calls in flight at once
+DIAL_MAX_IN_FLIGHT = int(os.getenv("DIAL_MAX_IN_FLIGHT", "10"))
+# Pause after a 429 that came without a usable Retry-After header
+DIAL_DEFAULT_RETRY_AFTER = float(os.getenv("DIAL_DEFAULT_RETRY_AFTER", "5"))
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse Retry-After as seconds or an HTTP date; None when absent or unreadable."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DialGovernor:
+    """
+    Paces dials to the Bland calls API.
+
+    A token bucket sets the calls per second, a semaphore caps requests in flight, and the
+    rate adapts AIMD-style: it creeps up with every accepted dial and is cut back on 429s,
+    5xx and connection errors, so a campaign settles at the fastest rate Bland sustains.
+    """
+
+    def __init__(self, rate: float = DIAL_RATE, min_rate: float = DIAL_RATE_MIN, max_rate: float = DIAL_RATE_MAX,
+                 burst: float = DIAL_BURST, max_in_flight: int = DIAL_MAX_IN_FLIGHT):
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, min_rate)
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._last_backoff = 0.0
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _take_token(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self):
+        """Block until a dial may start, and hold an in-flight slot while it runs."""
+        self._in_flight.acquire()
+        try:
+            self._take_token()
+            yield
+        finally:
+            self._in_flight.release()
+
+    def record(self, response: httpx.Response):
+        """Feed a /v1/calls response back into the rate."""
+        if response.status_code == 429:
+            self._back_off(retry_after_seconds(response) or DIAL_DEFAULT_RETRY_AFTER, "429")
+        elif response.status_code >= 500:
+            self._back_off(retry_after_seconds(response) or 0.0, str(response.status_code))
+        elif response.status_code < 400:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + DIAL_RATE_STEP)
+
+    def record_error(self, error: Exception):
+        """Timeouts and dropped connections count as congestion too."""
+        self._back_off(0.0, type(error).__name__)
+
+    def retry_delay(self) -> float:
+        """Seconds until dialing resumes after a 429, at least one token's worth."""
+        with self._lock:
+            return max(self._paused_until - time.monotonic(), 1 / self.rate)
+
+    def _back_off(self, pause: float, reason: str):
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + pause)
+            # Dials already in flight when Bland pushed back fail together; cut the rate once for them
+            if now - self._last_backoff < 1 / self.rate:
+                return
+            self._last_backoff = now
+            self.rate = max(self.min_rate, self.rate * DIAL_RATE_BACKOFF)
+            self._tokens = min(self._tokens, 0.0)
+            rate = self.rate
+        logger.warning(f"Bland API pushed back ({reason}); dial rate now {rate:.2f}/s, paused {pause:.1f}s")
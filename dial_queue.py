@@ -0,0 +1,328 @@
+import os
+import time
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed per poll and the threads that dial them, per worker process; the dial
+# governor decides how fast those threads actually place calls
+DIAL_QUEUE_BATCH_SIZE = int(os.getenv("DIAL_QUEUE_BATCH_SIZE", "20"))
+DIAL_QUEUE_CONCURRENCY = int(os.getenv("DIAL_QUEUE_CONCURRENCY", "10"))
+# Longest an idle worker sleeps before polling again; it wakes sooner when the next dial is due
+DIAL_QUEUE_POLL_SECONDS = float(os.getenv("DIAL_QUEUE_POLL_SECONDS", "30"))
+# Claimed rows not finished within this many seconds are assumed orphaned by a dead worker
+DIAL_QUEUE_LEASE_SECONDS = int(os.getenv("DIAL_QUEUE_LEASE_SECONDS", "300"))
+DIAL_QUEUE_MAX_ATTEMPTS = int(os.getenv("DIAL_QUEUE_MAX_ATTEMPTS", "3"))
+# Tries at recording a dial's outcome before leaving the row to lease expiry
+DIAL_QUEUE_OUTCOME_RETRIES = int(os.getenv("DIAL_QUEUE_OUTCOME_RETRIES", "4"))
+
+# Outcomes a dial handler returns
+DIALED = "dialed"
+QUOTA_EXCEEDED = "quota_exceeded"
+RATE_LIMITED = "rate_limited"
+FAILED = "failed"
+
+
+def _aware(moment: datetime) -> datetime:
+    # Callers pass naive local times; pin them down before they meet a TIMESTAMPTZ column
+    return moment if moment.tzinfo else moment.astimezone()
+
+
+class DialQueue:
+    """
+    Durable queue of pending dials in Postgres.
+
+    Any number of worker processes, on any number of machines, claim due rows with
+    FOR UPDATE SKIP LOCKED, so each row is handed to exactly one of them. A person has
+    at most one pending or in-progress row at a time. Rows carry only the person id;
+    workers load the person rows in one query per claimed batch.
+    """
+
+    def __init__(self, db_pool, table: str = "dial_queue"):
+        self.db_pool = db_pool
+        self.table = table
+
+    def create_table(self):
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    id BIGSERIAL PRIMARY KEY,
+                    person_id TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    due_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claimed_by TEXT,
+                    claimed_at TIMESTAMPTZ,
+                    last_error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS {self.table}_active_person
+                    ON {self.table} (person_id) WHERE status IN ('pending', 'in_progress');
+                -- Matches claim()'s ORDER BY, so a claim reads only the rows it takes even when a
+                -- whole campaign shares one due time
+                CREATE INDEX IF NOT EXISTS {self.table}_due
+                    ON {self.table} (priority DESC, due_at) WHERE status = 'pending';
+            """)
+        logger.info(f"Dial queue table {self.table} ready")
+
+    def enqueue_many(self, dials: List[Tuple[Any, datetime, int]]) -> int:
+        """
+        Add (person_id, due_at, priority) rows in one statement. A person already
+        waiting in the queue gets the new time and priority instead of a second row.
+        """
+        if not dials:
+            return 0
+        rows = [(str(person_id), _aware(due_at), priority) for person_id, due_at, priority in dials]
+        with self.db_pool.cursor() as cursor:
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {self.table} (person_id, due_at, priority)
+                VALUES %s
+                ON CONFLICT (person_id) WHERE status IN ('pending', 'in_progress')
+                DO UPDATE SET due_at = EXCLUDED.due_at, priority = EXCLUDED.priority, updated_at = NOW()
+                WHERE {self.table}.status = 'pending'
+                """,
+                rows,
+                page_size=1000
+            )
+        return len(rows)
+
+    def seconds_until_next_due(self) -> Optional[float]:
+        """How long until the earliest pending row is due, None when nothing is pending."""
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(
+                f"SELECT EXTRACT(EPOCH FROM MIN(due_at) - NOW()) FROM {self.table} WHERE status = 'pending'"
+            )
+            seconds = cursor.fetchone()[0]
+        return None if seconds is None else max(0.0, float(seconds))
+
+    def claim(self, worker_id: str, batch_size: int = DIAL_QUEUE_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """Atomically take up to batch_size due rows, highest priority and oldest first."""
+        with self.db_pool.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(f"""
+                UPDATE {self.table} AS q
+                SET status = 'in_progress', claimed_by = %s, claimed_at = NOW(),
+                    attempts = q.attempts + 1, updated_at = NOW()
+                FROM (
+                    SELECT id FROM {self.table}
+                    WHERE status = 'pending' AND due_at <= NOW()
+                    ORDER BY priority DESC, due_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) AS due
+                WHERE q.id = due.id
+                RETURNING q.id, q.person_id, q.attempts, q.created_at
+            """, (worker_id, batch_size))
+            return cursor.fetchall()
+
+    def complete(self, dial_id: int):
+        self._finish(dial_id, "done", None)
+
+    def reschedule(self, dial_id: int, due_at: datetime, error: Optional[str] = None, count_attempt: bool = False):
+        """Put a claimed row back to pending for a later time."""
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {self.table}
+                SET status = 'pending', due_at = %s, last_error = %s, claimed_by = NULL, claimed_at = NULL,
+                    attempts = attempts - %s, updated_at = NOW()
+                WHERE id = %s
+            """, (_aware(due_at), error, 0 if count_attempt else 1, dial_id))
+
+    def fail(self, dial_id: int, attempts: int, error: str):
+        """Retry with backoff until DIAL_QUEUE_MAX_ATTEMPTS, then give up on the row."""
+        if attempts >= DIAL_QUEUE_MAX_ATTEMPTS:
+            self._finish(dial_id, "failed", error)
+        else:
+            backoff = timedelta(minutes=5 * 2 ** (attempts - 1))
+            self.reschedule(dial_id, datetime.now() + backoff, error, count_attempt=True)
+
+    def _finish(self, dial_id: int, status: str, error: Optional[str]):
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self.table} SET status = %s, last_error = %s, updated_at = NOW() WHERE id = %s",
+                (status, error, dial_id)
+            )
+
+    def renew(self, dial_ids: List[int], worker_id: str) -> int:
+        """Extend the lease on rows this worker still holds, e.g. while a dial waits on pacing."""
+        if not dial_ids:
+            return 0
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {self.table} SET claimed_at = NOW()
+                WHERE id = ANY(%s) AND claimed_by = %s AND status = 'in_progress'
+            """, (list(dial_ids), worker_id))
+            return cursor.rowcount
+
+    def requeue_stale(self, lease_seconds: int = DIAL_QUEUE_LEASE_SECONDS) -> int:
+        """Release rows claimed by workers that died before finishing them."""
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {self.table}
+                SET status = 'pending', claimed_by = NULL, claimed_at = NULL, updated_at = NOW()
+                WHERE status = 'in_progress' AND claimed_at < NOW() - make_interval(secs => %s)
+            """, (lease_seconds,))
+            requeued = cursor.rowcount
+        if requeued:
+            logger.warning(f"Requeued {requeued} dials whose worker lease expired")
+        return requeued
+
+
+class DialWorker:
+    """
+    The one dispatcher loop over a DialQueue. It sleeps until the next row is due (or it is
+    woken), claims a batch, loads those people with load_people(person_ids) and runs each
+    through handler(person), which returns DIALED, QUOTA_EXCEEDED or RATE_LIMITED (with the
+    time to retry) or FAILED.
+
+    Leases on claimed rows are renewed until their outcome is recorded, so a slow or paced
+    dial is never handed to a second worker. A row that comes back anyway (the worker died
+    after dialing, or its outcome could not be written) is completed without a dial when
+    already_dialed(row, person) says the person was called since the row was queued.
+    """
+
+    def __init__(self, queue: DialQueue, handler: Callable[[Dict[str, Any]], Tuple[str, Optional[datetime]]],
+                 load_people: Callable[[List[str]], Dict[str, Dict[str, Any]]],
+                 already_dialed: Optional[Callable[[Dict[str, Any], Dict[str, Any]], bool]] = None,
+                 concurrency: int = DIAL_QUEUE_CONCURRENCY, batch_size: int = DIAL_QUEUE_BATCH_SIZE,
+                 poll_seconds: float = DIAL_QUEUE_POLL_SECONDS):
+        self.queue = queue
+        self.handler = handler
+        self.load_people = load_people
+        self.already_dialed = already_dialed
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dial")
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lease_thread: Optional[threading.Thread] = None
+        self._leases_stop = threading.Event()
+        # Claimed rows whose outcome isn't recorded yet
+        self._held: set = set()
+        self._held_lock = threading.Lock()
+
+    def _dial(self, row: Dict[str, Any], person: Optional[Dict[str, Any]]):
+        try:
+            if person is None:
+                # Deleted, or no longer has a phone number, since it was queued
+                self._record(self.queue.fail, row["id"], DIAL_QUEUE_MAX_ATTEMPTS, "person not found")
+                return
+            if self.already_dialed is not None and self.already_dialed(row, person):
+                logger.warning(f"Dial {row['id']} for person {row['person_id']} was already placed; not dialing again")
+                self._record(self.queue.complete, row["id"])
+                return
+            try:
+                outcome, retry_at = self.handler(person)
+            except Exception as e:
+                logger.exception(f"Dial {row['id']} for person {row['person_id']} raised")
+                outcome, retry_at = FAILED, None
+                error = str(e)
+            else:
+                error = None if outcome == DIALED else outcome
+            if outcome == DIALED:
+                self._record(self.queue.complete, row["id"])
+            elif outcome in (QUOTA_EXCEEDED, RATE_LIMITED):
+                self._record(self.queue.reschedule, row["id"], retry_at or datetime.now() + timedelta(days=1), error)
+            else:
+                self._record(self.queue.fail, row["id"], row["attempts"], error)
+        finally:
+            with self._held_lock:
+                self._held.discard(row["id"])
+
+    def _record(self, write: Callable, dial_id: int, *args):
+        for attempt in range(DIAL_QUEUE_OUTCOME_RETRIES):
+            try:
+                write(dial_id, *args)
+                return
+            except Exception as e:
+                logger.warning(f"Failed to record outcome of dial {dial_id} ({attempt + 1}/{DIAL_QUEUE_OUTCOME_RETRIES}): {e}")
+                if attempt < DIAL_QUEUE_OUTCOME_RETRIES - 1:
+                    time.sleep(0.5 * 2 ** attempt)
+        # The lease expires and the row comes back; already_dialed keeps a placed call from repeating
+        logger.error(f"Gave up recording outcome of dial {dial_id}")
+
+    def _keep_leases(self):
+        while not self._leases_stop.wait(DIAL_QUEUE_LEASE_SECONDS / 3):
+            with self._held_lock:
+                held = list(self._held)
+            try:
+                self.queue.renew(held, self.worker_id)
+            except Exception as e:
+                logger.error(f"Failed to renew leases on {len(held)} dials: {e}")
+
+    def run_once(self) -> int:
+        """Claim one batch and dial it; returns how many rows were claimed."""
+        rows = self.queue.claim(self.worker_id, self.batch_size)
+        if not rows:
+            return 0
+        with self._held_lock:
+            self._held.update(row["id"] for row in rows)
+        try:
+            people = self.load_people([row["person_id"] for row in rows])
+        except Exception:
+            # Stop renewing so the lease expires and the rows go back to the queue
+            with self._held_lock:
+                self._held.difference_update(row["id"] for row in rows)
+            raise
+        list(self._executor.map(self._dial, rows, [people.get(row["person_id"]) for row in rows]))
+        return len(rows)
+
+    def _idle_seconds(self) -> float:
+        try:
+            next_due = self.queue.seconds_until_next_due()
+        except Exception as e:
+            logger.error(f"Dial worker could not read the next due time: {e}")
+            return self.poll_seconds
+        return self.poll_seconds if next_due is None else min(self.poll_seconds, next_due)
+
+    def wake(self):
+        """Re-check the queue now, e.g. after enqueueing dials due sooner than the current sleep."""
+        self._wake.set()
+
+    def run(self):
+        logger.info(f"Dial worker {self.worker_id} started")
+        last_requeue = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_requeue > DIAL_QUEUE_LEASE_SECONDS / 2:
+                    self.queue.requeue_stale()
+                    last_requeue = time.monotonic()
+                claimed = self.run_once()
+            except Exception as e:
+                logger.error(f"Dial worker poll failed: {e}")
+                claimed = 0
+            # A full batch means more may be due, so poll again straight away
+            if claimed < self.batch_size and not self._stop.is_set():
+                self._wake.wait(self._idle_seconds())
+                self._wake.clear()
+        logger.info(f"Dial worker {self.worker_id} stopped")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="dial-worker", daemon=True)
+            self._thread.start()
+            self._lease_thread = threading.Thread(target=self._keep_leases, name="dial-leases", daemon=True)
+            self._lease_thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        # Dials still running keep their leases until they finish
+        self._executor.shutdown(wait=True)
+        self._leases_stop.set()
+        if self._lease_thread is not None:
+            self._lease_thread.join()
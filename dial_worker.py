@@ -0,0 +1,30 @@
+"""
+Standalone dial worker: claims due rows from the dial_queue table and places the calls.
+
+Run as many as needed, on any machine that can reach the database:
+    python dial_worker.py
+Set DIAL_WORKER_IN_APP=0 on the API to leave all dialing to these processes.
+"""
+import signal
+import logging
+import threading
+
+import make_call
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+
+    worker = make_call.start_dial_worker()
+    stopped.wait()
+    logging.info("Stopping dial worker")
+    worker.stop()
+    make_call.quota_tracker.stop()
+    make_call.db_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import metrics
+from config import SYSTEM_PROMPT, REDUCED_SYSTEM_PROMPT
+from contact_extraction import CONTACT_RULES_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Changing either prompt or the local contact rules changes what is extracted, so all are part of every key
+PROMPT_VERSION = hashlib.sha256(
+    "\0".join([SYSTEM_PROMPT, REDUCED_SYSTEM_PROMPT, CONTACT_RULES_VERSION]).encode("utf-8")
+).hexdigest()[:16]
+
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "extraction_cache.sqlite3")
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 24 * 3600)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "1024"))
+
+
+def make_cache_key(file_bytes: bytes, *variant: str) -> str:
+    """Build a content-addressed key from the file bytes, prompt version and any pipeline variant."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    return ":".join([digest, PROMPT_VERSION, *variant])
+
+
+class ExtractionCache:
+    """Two-tier cache of normalized extraction content: in-process LRU in front of SQLite."""
+
+    def __init__(self, path: Optional[str] = EXTRACTION_CACHE_PATH, ttl: int = EXTRACTION_CACHE_TTL,
+                 max_entries: int = EXTRACTION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS extraction_cache (
+                        key TEXT PRIMARY KEY,
+                        content TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                self._db.commit()
+                logger.info(f"Extraction cache persisted at {path}")
+            except sqlite3.Error as e:
+                logger.warning(f"Extraction cache disk tier disabled: {e}")
+                self._db = None
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, content: Dict[str, Any], created_at: float):
+        self._memory[key] = (content, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                content, created_at = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    metrics.CACHE_LOOKUPS.labels(result="memory_hit").inc()
+                    return dict(content)
+                del self._memory[key]
+                self._stats["evictions"] += 1
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT content, created_at FROM extraction_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row and not self._expired(row[1]):
+                        content = json.loads(row[0])
+                        self._remember(key, content, row[1])
+                        self._stats["disk_hits"] += 1
+                        metrics.CACHE_LOOKUPS.labels(result="disk_hit").inc()
+                        return dict(content)
+                    if row:
+                        self._db.execute("DELETE FROM extraction_cache WHERE key = ?", (key,))
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Extraction cache read failed: {e}")
+
+            self._stats["misses"] += 1
+            metrics.CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+    def set(self, key: str, content: Dict[str, Any]):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, dict(content), created_at)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO extraction_cache (key, content, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(content), created_at)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Extraction cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM extraction_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hits": hits,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "prompt_version": PROMPT_VERSION,
+            }
+
+
+extraction_cache = ExtractionCache()
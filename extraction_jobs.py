@@ -0,0 +1,165 @@
+import os
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Any, List, Optional, Tuple
+
+from utils import process_single_file
+
+logger = logging.getLogger(__name__)
+
+# Files processed at the same time across all jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "5"))
+# How long finished jobs stay available for polling
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# Directory queued uploads wait in until a worker reads them; the system temp dir if unset
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR") or None
+
+
+def spool_upload(file: BinaryIO, filename: str) -> str:
+    """Copy an upload to a temporary file and return its path, so queued jobs hold no file bytes in memory."""
+    suffix = os.path.splitext(filename)[1].lower()
+    file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="job-", suffix=suffix, dir=JOB_SPOOL_DIR, delete=False) as spooled:
+        shutil.copyfileobj(file, spooled)
+    return spooled.name
+
+
+def remove_spooled(path: Optional[str]):
+    if path is None:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to remove spooled upload {path}: {e}")
+
+
+class ExtractionJobs:
+    """Runs uploaded files through process_single_file on a bounded worker pool and tracks per-file status."""
+
+    def __init__(self, workers: int = JOB_WORKERS, retention: int = JOB_RETENTION_SECONDS):
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extraction-job")
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, files: List[Tuple[str, Optional[str]]], fields: Optional[List[str]] = None) -> str:
+        """
+        Queue (filename, path) pairs from spool_upload; a path of None marks a file rejected as
+        unsupported. The job owns the files and removes each once it has been processed.
+        """
+        self._purge_expired()
+        job_id = uuid.uuid4().hex
+        entries = []
+        for filename, path in files:
+            entry = {"filename": filename, "status": "queued", "result": None, "error": None, "path": path}
+            if path is None:
+                error_msg = f"File {filename} has unsupported type. Only PDF and DOCX are allowed."
+                entry.update(status="error", error=error_msg, result={
+                    "filename": filename,
+                    "status": "error",
+                    "content": {},
+                    "error": error_msg
+                })
+            entries.append(entry)
+
+        job = {"job_id": job_id, "created_at": time.time(), "finished_at": None, "files": entries}
+        with self._lock:
+            self._jobs[job_id] = job
+
+        for entry in entries:
+            if entry["path"] is not None:
+                self._executor.submit(self._run_file, job, entry, fields)
+        self._mark_finished(job)
+        logger.info(f"Job {job_id} submitted with {len(files)} files")
+        return job_id
+
+    def _run_file(self, job: Dict[str, Any], entry: Dict[str, Any], fields: Optional[List[str]] = None):
+        filename = entry["filename"]
+        entry["status"] = "processing"
+        try:
+            result = process_single_file(entry["path"], filename, fields)
+        except Exception as e:
+            logger.exception(f"Error processing {filename} in job {job['job_id']}: {str(e)}")
+            result = {"filename": filename, "status": "error", "content": {}, "error": str(e)}
+        finally:
+            remove_spooled(entry["path"])
+
+        with self._lock:
+            entry["result"] = result
+            entry["error"] = f"{filename}: {result['error']}" if result["error"] else None
+            entry["status"] = result["status"]
+        self._mark_finished(job)
+
+    def _mark_finished(self, job: Dict[str, Any]):
+        with self._lock:
+            if job["finished_at"] is None and all(e["status"] in ("success", "error") for e in job["files"]):
+                job["finished_at"] = time.time()
+                logger.info(f"Job {job['job_id']} completed")
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _job_status(self, job: Dict[str, Any]) -> str:
+        if job["finished_at"] is not None:
+            return "completed"
+        if any(e["status"] != "queued" for e in job["files"]):
+            return "processing"
+        return "queued"
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            files = job["files"]
+            return {
+                "job_id": job_id,
+                "status": self._job_status(job),
+                "total_files": len(files),
+                "completed_files": sum(1 for e in files if e["status"] in ("success", "error")),
+                "successful_files": sum(1 for e in files if e["status"] == "success"),
+                "failed_files": sum(1 for e in files if e["status"] == "error"),
+                "files": [
+                    {"filename": e["filename"], "status": e["status"], "error": e["error"]}
+                    for e in files
+                ]
+            }
+
+    def results(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Results in MultiProcessResponse shape; while running only finished files are included."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            files = job["files"]
+            return {
+                "status": self._job_status(job),
+                "results": [e["result"] for e in files if e["result"] is not None],
+                "total_files": len(files),
+                "successful_files": sum(1 for e in files if e["status"] == "success"),
+                "failed_files": sum(1 for e in files if e["status"] == "error"),
+                "errors": [e["error"] for e in files if e["error"]]
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        # Cancelled files never reach _run_file, so their spooled copies are removed here
+        with self._lock:
+            queued = [e["path"] for job in self._jobs.values() for e in job["files"] if e["status"] == "queued"]
+        for path in queued:
+            remove_spooled(path)
+
+
+extraction_jobs = ExtractionJobs()
@@ -10,8 +10,8 @@ from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
 import logging
-import requests
 from typing import Optional
+from bland_client import bland_client
 
 # Load environment variables
 load_dotenv(override=True)
@@ -29,6 +29,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.on_event("shutdown")
+async def close_bland_client():
+    await bland_client.aclose()
+
 class EmailSchema(BaseModel):
     full_name: str
     phone_number: str
@@ -147,15 +152,12 @@ class JobApplication(BaseModel):
     work_experience: str
     phone_number: str
 
-def process_job_application(application_data: JobApplication) -> dict:
+async def process_job_application(application_data: JobApplication) -> dict:
     """
     Process job application data and initiate Bland AI call.
     """
-    BLAND_API_KEY = os.getenv("BLAND_API_KEY")
     PATHWAY_ID = os.getenv("PATHWAY_ID")
 
-    url = "https://api.bland.ai/v1/calls"
-
     phone_number = application_data.phone_number
     full_name = application_data.full_name
     job_title = application_data.job_title
@@ -179,11 +181,6 @@ def process_job_application(application_data: JobApplication) -> dict:
         }
     }
 
-    headers = {
-        "Authorization": f"Bearer {BLAND_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     logger.info(
         "Initiating Bland AI call for job application:\n"
         f"  Full Name: {full_name}\n"
@@ -194,7 +191,7 @@ def process_job_application(application_data: JobApplication) -> dict:
         f"  Pathway ID: {PATHWAY_ID}"
     )
     
-    response = requests.post(url, json=data, headers=headers)
+    response = await bland_client.astart_call(data)
 
     if response.status_code == 200:
         logger.info(
@@ -240,7 +237,7 @@ async def serve_html():
 async def submit_job_application(application: JobApplication):
     """Handle job application form submission"""
     try:
-        result = process_job_application(application)
+        result = await process_job_application(application)
         return {
             "success": True,
             "data": result
@@ -1,6 +1,7 @@
 import tempfile
 import os
 import shutil
+import asyncio
 import json
 import docx
 import re
@@ -19,7 +20,9 @@ from typing import Optional, Dict, Any, List
 # Import your existing processing code components
 from langchain.schema import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
+from llm_gateway import LLMGateway
 from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -51,6 +54,9 @@ logger.info("Environment variables loaded")
 
 logger.info("System prompt loaded from config")
 
+# Maximum number of uploaded files processed at the same time
+MAX_CONCURRENT_FILES = int(os.getenv("MAX_CONCURRENT_FILES", "5"))
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Document Processing API",
@@ -63,10 +69,14 @@ logger.info("FastAPI application initialized")
 llm = ChatOpenAI(
     api_key=OPENAI_API_KEY,
     temperature=0.7,
-    model="gpt-4o-mini"
+    model="gpt-4o-mini",
+    max_retries=0  # the gateway owns retries so it can honour Retry-After
 )
 logger.info("LLM initialized with model: gpt-4o-mini")
 
+# All extraction calls go through the gateway for RPM/TPM budgeting
+llm_gateway = LLMGateway(llm)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -221,7 +231,7 @@ def process_pdf(pdf_path):
             HumanMessage(content=all_page_images)
         ]
 
-        response = llm.invoke(messages, timeout=120)
+        response = llm_gateway.invoke(messages, timeout=120)
 
         api_duration = time.time() - api_start_time
         logger.info(f"OpenAI API response received in {api_duration:.2f} seconds")
@@ -310,7 +320,7 @@ def process_docx(docx_path):
             HumanMessage(content=all_messages)
         ]
 
-        response = llm.invoke(messages, timeout=120)
+        response = llm_gateway.invoke(messages, timeout=120)
 
         api_duration = time.time() - api_start_time
         logger.info(f"OpenAI API response received in {api_duration:.2f} seconds")
@@ -423,32 +433,27 @@ async def process_multiple_files_endpoint(
     if len(files) > 10:  # Limit to prevent abuse
         raise HTTPException(status_code=400, detail="Maximum 10 files allowed per request")
 
-    results = []
-    errors = []
-    successful_files = 0
-    failed_files = 0
+    results: List[Dict[str, Any]] = [None] * len(files)
+    file_errors: List[Optional[str]] = [None] * len(files)
     temp_paths = []
+    pending = []
 
     try:
-        # Process each file
+        # Validate and spool each upload, then process them concurrently
         for i, file in enumerate(files):
-            logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
-
             # Validate file type
             if not file.filename.lower().endswith(('.pdf', '.docx')):
                 error_msg = f"File {file.filename} has unsupported type. Only PDF and DOCX are allowed."
                 logger.warning(error_msg)
-                errors.append(error_msg)
-                results.append({
+                file_errors[i] = error_msg
+                results[i] = {
                     "filename": file.filename,
                     "status": "error",
                     "content": {},
                     "error": error_msg
-                })
-                failed_files += 1
+                }
                 continue
 
-            temp_path = None
             try:
                 # Create temporary file
                 suffix = '.pdf' if file.filename.lower().endswith('.pdf') else '.docx'
@@ -456,33 +461,49 @@ async def process_multiple_files_endpoint(
                     shutil.copyfileobj(file.file, temp_file)
                     temp_path = temp_file.name
                 temp_paths.append(temp_path)
-
-                # Process the file
-                result = process_single_file(temp_path, file.filename)
-                results.append(result)
-
-                if result["status"] == "success":
-                    successful_files += 1
-                    # Uncomment to save to PostgreSQL if needed
-                    # upsert_to_postgres(result["content"])
-                else:
-                    failed_files += 1
-                    if result["error"]:
-                        errors.append(f"{file.filename}: {result['error']}")
-
-                logger.info(f"File {i+1}/{len(files)} processed: {file.filename} - Status: {result['status']}")
-
+                pending.append((i, temp_path, file.filename))
             except Exception as e:
                 error_msg = f"Error processing {file.filename}: {str(e)}"
                 logger.exception(error_msg)
-                errors.append(error_msg)
-                results.append({
+                file_errors[i] = error_msg
+                results[i] = {
                     "filename": file.filename,
                     "status": "error",
                     "content": {},
                     "error": str(e)
-                })
-                failed_files += 1
+                }
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+
+        async def process_upload(i: int, temp_path: str, filename: str):
+            async with semaphore:
+                logger.info(f"Processing file {i+1}/{len(files)}: {filename}")
+                try:
+                    # process_single_file blocks on rendering and the LLM call, keep it off the event loop
+                    result = await run_in_threadpool(process_single_file, temp_path, filename)
+                    if result["status"] != "success" and result["error"]:
+                        file_errors[i] = f"{filename}: {result['error']}"
+                    # Uncomment to save to PostgreSQL if needed
+                    # elif result["status"] == "success":
+                    #     upsert_to_postgres(result["content"])
+                    logger.info(f"File {i+1}/{len(files)} processed: {filename} - Status: {result['status']}")
+                except Exception as e:
+                    error_msg = f"Error processing {filename}: {str(e)}"
+                    logger.exception(error_msg)
+                    file_errors[i] = error_msg
+                    result = {
+                        "filename": filename,
+                        "status": "error",
+                        "content": {},
+                        "error": str(e)
+                    }
+                results[i] = result
+
+        await asyncio.gather(*(process_upload(*item) for item in pending))
+
+        successful_files = sum(1 for result in results if result["status"] == "success")
+        failed_files = len(results) - successful_files
+        errors = [error for error in file_errors if error]
 
         # Prepare final response
         response = {
@@ -493,7 +514,6 @@ async def process_multiple_files_endpoint(
             "failed_files": failed_files,
             "errors": errors
         }
-
         logger.info(f"Files processing completed. Success: {successful_files}, Failed: {failed_files}")
         return JSONResponse(content=response)
 
@@ -503,10 +523,10 @@ async def process_multiple_files_endpoint(
             status_code=500,
             content={
                 "status": "error",
-                "results": results,
+                "results": [result for result in results if result is not None],
                 "total_files": len(files),
-                "successful_files": successful_files,
-                "failed_files": failed_files,
+                "successful_files": sum(1 for result in results if result and result["status"] == "success"),
+                "failed_files": sum(1 for result in results if result and result["status"] != "success"),
                 "errors": [str(e)]
             }
         )
@@ -0,0 +1,108 @@
+import os
+import base64
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+# Long edge in pixels a rendered page is scaled to before zoom clamping; the vision model
+# downsizes a letter page to 768px on its short side, so much more is wasted upload
+TARGET_LONG_EDGE = int(os.getenv("IMAGE_TARGET_LONG_EDGE", "1100"))
+MIN_ZOOM = float(os.getenv("IMAGE_MIN_ZOOM", "1.0"))
+MAX_ZOOM = float(os.getenv("IMAGE_MAX_ZOOM", "2.5"))
+# Characters per square inch above which small print gets a higher zoom
+DENSE_TEXT_CHARS_PER_SQ_INCH = float(os.getenv("IMAGE_DENSE_TEXT_DENSITY", "40"))
+
+# Lossy format and quality used for photo-like content
+IMAGE_PHOTO_FORMAT = os.getenv("IMAGE_PHOTO_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_MIN_QUALITY = int(os.getenv("IMAGE_MIN_QUALITY", "45"))
+# Images with more distinct colours than this (on a 64x64 sample) are treated as photos
+PHOTO_COLOR_THRESHOLD = int(os.getenv("IMAGE_PHOTO_COLOR_THRESHOLD", "1024"))
+# Raw image bytes allowed per document, split evenly across its images
+DOCUMENT_IMAGE_BYTE_BUDGET = int(os.getenv("DOCUMENT_IMAGE_BYTE_BUDGET", str(4 * 1024 * 1024)))
+# Images are never shrunk below this long edge to meet the budget
+MIN_LONG_EDGE = 640
+
+# Formats the vision model takes as they are; anything else (GIF, animations, TIFF) is re-encoded
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def choose_zoom(width_pt: float, height_pt: float, text_chars: int = 0) -> float:
+    """Pick a render zoom from the page size in points and how much text it carries."""
+    long_edge = max(width_pt, height_pt) or 1.0
+    zoom = TARGET_LONG_EDGE / long_edge
+    area_sq_inch = (width_pt * height_pt) / (72 * 72) or 1.0
+    if text_chars / area_sq_inch > DENSE_TEXT_CHARS_PER_SQ_INCH:
+        zoom *= 1.25
+    return round(min(MAX_ZOOM, max(MIN_ZOOM, zoom)), 2)
+
+
+def per_image_budget(image_count: int, document_budget: int = DOCUMENT_IMAGE_BYTE_BUDGET) -> Optional[int]:
+    if document_budget <= 0 or image_count <= 0:
+        return None
+    return document_budget // image_count
+
+
+def _sample_colors(image: Image.Image):
+    return image.convert("RGB").resize((64, 64)).getcolors(maxcolors=PHOTO_COLOR_THRESHOLD)
+
+
+def _is_grayscale(colors) -> bool:
+    return all(max(rgb) - min(rgb) < 16 for _, rgb in colors)
+
+
+def _save(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = BytesIO()
+    if fmt in ("JPEG", "WEBP"):
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            # Transparent areas would turn black when the alpha channel is dropped
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(buffer, format=fmt, quality=quality)
+    else:
+        image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def to_data_url(data: bytes, fmt: str) -> str:
+    return f"data:{MIME_TYPES[fmt]};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def encode_image(image: Image.Image, budget: Optional[int] = None) -> str:
+    """Encode an image as a data URL, lossless for text-like content and lossy for photos,
+    stepping quality and then size down until it fits the byte budget."""
+    colors = _sample_colors(image)
+    fmt = "PNG" if colors is not None else IMAGE_PHOTO_FORMAT
+    if colors is not None and image.mode != "L" and _is_grayscale(colors):
+        image = image.convert("L")
+    quality = IMAGE_QUALITY
+    while True:
+        data = _save(image, fmt, quality)
+        if budget is None or len(data) <= budget:
+            break
+        if fmt == "PNG":
+            fmt = IMAGE_PHOTO_FORMAT
+        elif quality > IMAGE_MIN_QUALITY:
+            quality = max(IMAGE_MIN_QUALITY, quality - 15)
+        elif max(image.size) * 0.75 >= MIN_LONG_EDGE:
+            image = image.resize((int(image.width * 0.75), int(image.height * 0.75)))
+        else:
+            break
+    return to_data_url(data, fmt)
+
+
+def encode_source_image(image_data: bytes, max_dim: int = 1024, budget: Optional[int] = None) -> str:
+    """Encode an embedded image, passing it through untouched when its format, size and budget allow."""
+    image = Image.open(BytesIO(image_data))
+    fits = image.width <= max_dim and image.height <= max_dim
+    animated = getattr(image, "is_animated", False)
+    if fits and not animated and image.format in MIME_TYPES and (budget is None or len(image_data) <= budget):
+        return to_data_url(image_data, image.format)
+    if not fits:
+        image.thumbnail((max_dim, max_dim))
+    return encode_image(image, budget)
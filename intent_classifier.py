@@ -0,0 +1,235 @@
+import os
+import re
+import json
+import math
+import bisect
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ("yes", "no", "later")
+# Local predictions below this confidence go to Bland's remote analyze instead
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.8"))
+# Naive Bayes model trained by benchmarks/intent_eval.py --train; rules alone without it
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "intent_model.json")
+# Holdout predictions needed above a confidence level before the model's accuracy there is trusted
+INTENT_CALIBRATION_MIN_SUPPORT = int(os.getenv("INTENT_CALIBRATION_MIN_SUPPORT", "20"))
+
+STRONG, WEAK = 1.0, 0.5
+# (pattern, weight) per intent; only a STRONG phrase can make a prediction confident, WEAK ones
+# just move the confidence. "no" and "later" phrases are matched first and cut out, so
+# "not interested" never reads as "interested".
+INTENT_RULES: Dict[str, List[Tuple[str, float]]] = {
+    "no": [
+        (r"\bnot (really )?(interested|looking)\b", 1.0),
+        (r"\b(remove|take) me off\b", 1.0),
+        (r"\b(removed|taken off)\b", 1.0),
+        (r"\bunsubscribe\b", 1.0),
+        (r"\bno,? thank(s| you)\b", 1.0),
+        (r"\b(stop|don'?t|do not) call(ing)?\b", 1.0),
+        (r"\bremove me\b", 1.0),
+        (r"\bwrong (number|person)\b", 1.0),
+        (r"\balready (have|found|got|accepted) (a |another )?(job|position|offer)\b", 1.0),
+        (r"\b(i'?ll|i will) pass\b", 1.0),
+        (r"\bnot for me\b", 1.0),
+        (r"\bno\b", 0.5),
+        (r"\bnope\b", 0.5),
+    ],
+    "later": [
+        (r"\bcall (me )?(back|later|tomorrow)\b", 1.0),
+        (r"\b(i'?ll|i will) call you back\b", 1.0),
+        (r"\b(try|reach) me (again )?(later|tomorrow|another time)\b", 1.0),
+        (r"\bnot a good time\b", 1.0),
+        (r"\b(i'?m|i am) (busy|driving|at work|in a meeting)\b", 1.0),
+        (r"\bcan'?t talk\b", 1.0),
+        (r"\blater\b", 0.5),
+        (r"\bbusy\b", 0.5),
+    ],
+    "yes": [
+        (r"\b(i'?m|i am|i'?d be|i would be) (very |really |definitely )?interested\b", 1.0),
+        (r"\bsounds (good|great|interesting|perfect)\b", 1.0),
+        (r"\btell me more\b", 1.0),
+        (r"\bsend (me )?(the |more )?(details|info|information)\b", 1.0),
+        (r"\b(i'?d|i would) (love|like) to (hear|learn|know) more\b", 1.0),
+        (r"\b(i'?d|i would) (love|like) to apply\b", 1.0),
+        (r"\binterested\b", 0.5),
+        (r"\b(yes|yeah|yep|sure|absolutely|definitely)\b", 0.5),
+    ],
+}
+# Hesitation counts against whichever label wins, so it pushes the call to the remote analyze
+HEDGE_RULES = [
+    r"\bnot sure\b", r"\bthink about it\b", r"\bmaybe\b", r"\bi don'?t know\b",
+    r"\bwhatever\b", r"\bwho('?s| is) (this|calling)\b", r"\bwhat('?s| is) this (about|regarding)\b",
+]
+# A lone strong phrase lands just above the default threshold; weak-only evidence stays below it
+STRONG_BASE_CONFIDENCE = 0.85
+WEAK_ONLY_MAX_CONFIDENCE = min(0.6, INTENT_MIN_CONFIDENCE * 0.75)
+
+_COMPILED_HEDGES = [re.compile(pattern) for pattern in HEDGE_RULES]
+_COMPILED_RULES = [(intent, re.compile(pattern), weight)
+                   for intent in ("no", "later", "yes") for pattern, weight in INTENT_RULES[intent]]
+_SPEAKER_LINE = re.compile(r"^\s*(user|assistant|agent|ai)\s*:\s*", re.IGNORECASE)
+_WORD = re.compile(r"[a-z']+")
+
+
+class IntentPrediction(NamedTuple):
+    label: str
+    confidence: float
+    source: str  # "rules" or "model"
+
+
+def caller_text(transcript: str) -> str:
+    """The caller's side of a Bland transcript ("user: ..." lines), or all of it if unlabelled."""
+    user_lines, labelled = [], False
+    for line in transcript.splitlines():
+        match = _SPEAKER_LINE.match(line)
+        if match:
+            labelled = True
+            if match.group(1).lower() == "user":
+                user_lines.append(line[match.end():])
+    return ("\n".join(user_lines) if labelled else transcript).lower()
+
+
+def rule_scores(text: str) -> Tuple[Dict[str, float], Dict[str, int], float]:
+    """(weighted score per intent, strong phrase hits per intent, hedge weight)."""
+    hedge = 0.0
+    for pattern in _COMPILED_HEDGES:
+        text, hits = pattern.subn(" ", text)
+        hedge += WEAK * hits
+    scores = dict.fromkeys(INTENTS, 0.0)
+    strong = dict.fromkeys(INTENTS, 0)
+    for intent, pattern, weight in _COMPILED_RULES:
+        text, hits = pattern.subn(" ", text)
+        scores[intent] += weight * hits
+        if weight >= STRONG:
+            strong[intent] += hits
+    return scores, strong, hedge
+
+
+def rule_confidence(scores: Dict[str, float], strong: Dict[str, int], hedge: float, best: str) -> float:
+    if not scores[best]:
+        return 0.0
+    share = scores[best] / (sum(scores.values()) + hedge)
+    if strong[best]:
+        # Each extra phrase for the same label adds a little
+        return share * min(1.0, STRONG_BASE_CONFIDENCE + 0.05 * (scores[best] - STRONG) / WEAK)
+    return share * min(WEAK_ONLY_MAX_CONFIDENCE, WEAK_ONLY_MAX_CONFIDENCE * scores[best])
+
+
+def tokens(text: str) -> List[str]:
+    words = _WORD.findall(text)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class NaiveBayesIntentModel:
+    """
+    Multinomial naive Bayes over caller unigrams and bigrams, stored as plain JSON counts.
+
+    Its posteriors run close to 1.0 whatever the evidence, so they are not compared with
+    INTENT_MIN_CONFIDENCE directly: calibrate() maps them to the accuracy measured on held
+    out calls, and a model that was never calibrated is never confident.
+    """
+
+    def __init__(self, class_counts: Optional[Dict[str, int]] = None,
+                 token_counts: Optional[Dict[str, Dict[str, int]]] = None,
+                 calibration: Optional[List[Tuple[float, float]]] = None):
+        self.class_counts = class_counts or {}
+        self.token_counts = token_counts or {}
+        # (posterior, holdout accuracy of predictions at least that confident), ascending
+        self.calibration = sorted(tuple(point) for point in calibration or [])
+        self._totals = {label: sum(counts.values()) for label, counts in self.token_counts.items()}
+        self._vocabulary = len({token for counts in self.token_counts.values() for token in counts})
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str]]) -> "NaiveBayesIntentModel":
+        """Fit on (transcript, intent) pairs; intents outside INTENTS are skipped."""
+        class_counts: Counter = Counter()
+        token_counts: Dict[str, Counter] = {}
+        for transcript, intent in examples:
+            if intent not in INTENTS:
+                continue
+            class_counts[intent] += 1
+            token_counts.setdefault(intent, Counter()).update(tokens(caller_text(transcript)))
+        return cls(dict(class_counts), {label: dict(counts) for label, counts in token_counts.items()})
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        total = sum(self.class_counts.values())
+        words = tokens(text)
+        log_probs = {}
+        for label, count in self.class_counts.items():
+            counts, denominator = self.token_counts.get(label, {}), self._totals.get(label, 0) + self._vocabulary + 1
+            log_probs[label] = math.log(count / total) + sum(
+                math.log((counts.get(word, 0) + 1) / denominator) for word in words)
+        best = max(log_probs, key=log_probs.get)
+        # Softmax of the log likelihoods gives the posterior of the best label
+        confidence = 1 / sum(math.exp(value - log_probs[best]) for value in log_probs.values())
+        return best, confidence
+
+    def calibrate(self, examples: Iterable[Tuple[str, str]], min_support: int = INTENT_CALIBRATION_MIN_SUPPORT):
+        """Fit the posterior-to-accuracy mapping on (transcript, intent) pairs the model was not trained on."""
+        scored = []
+        for transcript, intent in examples:
+            if intent in INTENTS:
+                label, confidence = self.predict(caller_text(transcript))
+                scored.append((confidence, label == intent))
+        scored.sort(reverse=True)
+        points, correct = [], 0
+        for seen, (confidence, right) in enumerate(scored, 1):
+            correct += right
+            if seen >= min_support:
+                points.append((confidence, correct / seen))
+        self.calibration = sorted(points)
+
+    def calibrated_confidence(self, posterior: float) -> float:
+        """Holdout accuracy of predictions at least as confident; 0.0 below every calibrated level."""
+        index = bisect.bisect_right(self.calibration, (posterior, math.inf)) - 1
+        return self.calibration[index][1] if index >= 0 else 0.0
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"class_counts": self.class_counts, "token_counts": self.token_counts,
+                       "calibration": self.calibration}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesIntentModel":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["class_counts"], data["token_counts"], data.get("calibration"))
+
+
+class IntentClassifier:
+    """
+    Labels a call transcript yes / no / later without a network hop.
+
+    Phrase rules answer first; when they are not decisive and a trained model is present
+    its prediction is used if its calibrated confidence is higher. Callers fall back to the remote analyze
+    endpoint when the confidence is below their threshold.
+    """
+
+    def __init__(self, model: Optional[NaiveBayesIntentModel] = None):
+        self.model = model
+
+    @classmethod
+    def from_path(cls, path: str = INTENT_MODEL_PATH) -> "IntentClassifier":
+        if not os.path.exists(path):
+            return cls()
+        try:
+            return cls(NaiveBayesIntentModel.load(path))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load intent model {path}, using rules only: {e}")
+            return cls()
+
+    def classify(self, transcript: str) -> IntentPrediction:
+        text = caller_text(transcript or "")
+        scores, strong, hedge = rule_scores(text)
+        best = max(INTENTS, key=scores.get)
+        confidence = rule_confidence(scores, strong, hedge, best)
+        prediction = IntentPrediction(best if scores[best] else "unknown", confidence, "rules")
+        if self.model is not None and prediction.confidence < INTENT_MIN_CONFIDENCE and text.strip():
+            label, posterior = self.model.predict(text)
+            model_confidence = self.model.calibrated_confidence(posterior)
+            if model_confidence > prediction.confidence:
+                prediction = IntentPrediction(label, model_confidence, "model")
+        return prediction
@@ -0,0 +1,211 @@
+import os
+import math
+import time
+import base64
+import asyncio
+import logging
+import binascii
+import threading
+from io import BytesIO
+from typing import Any, List, Optional, Tuple
+
+import openai
+from PIL import Image
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Provider budgets for gpt-4o-mini; set them to the limits of the account tier
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Output tokens reserved per call on top of the estimated prompt
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "600"))
+# Prompt tokens per image as (base, per 512px tile) for each vision model; gpt-4o-mini is
+# billed and rate limited at about 33x the gpt-4o token count for the same image
+IMAGE_TOKEN_COSTS = {
+    "gpt-4o-mini": (2833, 5667),
+    "gpt-4o": (85, 170),
+}
+# Tiles assumed when an image's size can't be read: a letter page at 768px is 2x2
+DEFAULT_IMAGE_TILES = 4
+# Base64 characters decoded to find an image's dimensions in its header
+_IMAGE_HEADER_CHARS = 64 * 1024
+
+
+def image_token_cost(model: str) -> Tuple[int, int]:
+    """(base, per tile) image tokens for a model name, the most expensive known if it is unknown."""
+    for name in sorted(IMAGE_TOKEN_COSTS, key=len, reverse=True):
+        if model.startswith(name):
+            return IMAGE_TOKEN_COSTS[name]
+    return max(IMAGE_TOKEN_COSTS.values())
+
+
+def image_tiles(image_url: dict) -> int:
+    """512px tiles the provider charges for an image, after its fit-to-2048 and 768px-short-side scaling."""
+    if image_url.get("detail") == "low":
+        return 0
+    url = image_url.get("url", "")
+    try:
+        header = url[url.index(",") + 1:][:_IMAGE_HEADER_CHARS]
+        width, height = Image.open(BytesIO(base64.b64decode(header[:len(header) // 4 * 4]))).size
+    except (ValueError, OSError, binascii.Error):
+        return DEFAULT_IMAGE_TILES
+    scale = min(1.0, 2048 / max(width, height))
+    scale *= min(1.0, 768 / (min(width, height) * scale))
+    return math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+
+
+def estimate_tokens(messages: List[Any], model: str = "gpt-4o-mini") -> int:
+    """Rough prompt+completion estimate: ~4 characters per text token plus the model's tile cost per image."""
+    base, per_tile = image_token_cost(model)
+    tokens = LLM_EXPECTED_OUTPUT_TOKENS
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                tokens += len(part["text"]) // 4
+            elif part.get("type") == "image_url":
+                tokens += base + per_tile * image_tiles(part["image_url"])
+    return tokens
+
+
+def payload_bytes(messages: List[Any]) -> int:
+    """Characters of text and image data URLs in the request."""
+    size = 0
+    for message in messages:
+        content = message.content
+        if isinstance(content, str):
+            size += len(content)
+            continue
+        for part in content:
+            size += len(part.get("text") or part.get("image_url", {}).get("url", ""))
+    return size
+
+
+def retry_after_seconds(error: Exception, attempt: int) -> float:
+    """Honour the provider's Retry-After header, falling back to exponential backoff."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return min(60.0, 2.0 ** attempt)
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most one minute of budget."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        self.refill()
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+
+class LLMGateway:
+    """
+    Single path to the LLM for every extraction.
+
+    Calls run through the model's async invoke on a dedicated event loop, are admitted in
+    FIFO order against requests-per-minute and tokens-per-minute buckets, and back off on 429.
+    Worker threads use invoke(), coroutines use ainvoke().
+    """
+
+    def __init__(self, llm, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, max_retries: int = LLM_MAX_RETRIES):
+        self.llm = llm
+        self.model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or ""
+        self.max_retries = max_retries
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._blocked_until = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._admission: Optional[asyncio.Lock] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                self._admission = asyncio.Lock()
+                self._loop = loop
+        return self._loop
+
+    async def _acquire(self, tokens: int) -> float:
+        """Wait for budget and reserve it; returns the tokens reserved, at most one minute's worth."""
+        tokens = min(tokens, self._tokens.capacity)
+        # asyncio.Lock wakes waiters in arrival order, so queued calls are admitted fairly
+        async with self._admission:
+            while True:
+                wait = max(
+                    self._blocked_until - time.monotonic(),
+                    self._requests.wait_time(1),
+                    self._tokens.wait_time(tokens)
+                )
+                if wait <= 0:
+                    self._requests.available -= 1
+                    self._tokens.available -= tokens
+                    return tokens
+                await asyncio.sleep(wait)
+
+    async def _call(self, messages: List[Any], timeout: float):
+        estimated = estimate_tokens(messages, self.model)
+        size = payload_bytes(messages)
+        for attempt in range(self.max_retries + 1):
+            queued_at = time.perf_counter()
+            reserved = await self._acquire(estimated)
+            metrics.LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued_at)
+            metrics.BYTES_SENT.inc(size)
+            started_at = time.perf_counter()
+            try:
+                response = await self.llm.ainvoke(messages, timeout=timeout)
+            except openai.RateLimitError as e:
+                metrics.LLM_RATE_LIMITED.inc()
+                if attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e, attempt)
+                # A 429 applies to the whole account, so hold back every queued call
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                logger.warning(f"LLM rate limited, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                continue
+
+            metrics.LLM_SECONDS.observe(time.perf_counter() - started_at)
+
+            usage = getattr(response, "usage_metadata", None) or {}
+            for token_type in ("input_tokens", "output_tokens"):
+                if usage.get(token_type):
+                    metrics.TOKENS.labels(type=token_type.split("_")[0]).inc(usage[token_type])
+            if usage.get("total_tokens"):
+                # Settle the reservation against what the call actually used
+                self._tokens.available -= usage["total_tokens"] - reserved
+            return response
+
+    def invoke(self, messages: List[Any], timeout: float = 120):
+        """Blocking call for worker threads."""
+        future = asyncio.run_coroutine_threadsafe(self._call(messages, timeout), self._ensure_loop())
+        return future.result()
+
+    async def ainvoke(self, messages: List[Any], timeout: float = 120):
+        future = asyncio.run_coroutine_threadsafe(self._call(messages, timeout), self._ensure_loop())
+        return await asyncio.wrap_future(future)
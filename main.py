@@ -1,19 +1,26 @@
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, FileResponse
+from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, FileResponse, StreamingResponse, Response
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
+import json
+import asyncio
 import logging
-import tempfile
-import shutil
-from typing import List
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 
-from schema import EmailSchema, JobApplication, MultiProcessResponse
+from schema import EmailSchema, JobApplication, MultiProcessResponse, JobSubmitResponse, JobStatusResponse
 from utils import send_job_application_email, process_job_application, process_single_file
+from extraction_cache import extraction_cache
+from config import EXTRACTION_FIELDS
+from render_pool import shutdown_render_pool
+from extraction_jobs import extraction_jobs, spool_upload, remove_spooled
+from bland_client import bland_client
+import metrics
 
 
 load_dotenv(override=True)
@@ -21,6 +28,9 @@ load_dotenv(override=True)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of uploaded files processed at the same time
+MAX_CONCURRENT_FILES = int(os.getenv("MAX_CONCURRENT_FILES", "5"))
+
 app = FastAPI(title="Job Application API", version="1.0.0")
 
 app.add_middleware(
@@ -81,7 +91,7 @@ async def not_interested(email: EmailSchema):
 async def submit_job(application: JobApplication):
     logger.info(f"Received job application: {application}")
     try:
-        result = process_job_application(application)
+        result = await process_job_application(application)
         return {"success": True, "data": result}
     except ValueError as e:
         logger.error(f"Validation error: {e}")
@@ -96,13 +106,126 @@ async def root_choose():
     return RedirectResponse(url="/choose.html")
 
 
+@app.on_event("shutdown")
+async def stop_worker_pools():
+    extraction_jobs.shutdown()
+    shutdown_render_pool()
+    await bland_client.aclose()
+
+
+@app.get("/extraction-cache/stats")
+async def extraction_cache_stats():
+    return extraction_cache.stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    content, content_type = metrics.latest()
+    return Response(content=content, media_type=content_type)
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(status_code=422, content={"detail": exc.errors()})
 
+def is_supported_upload(file: UploadFile) -> bool:
+    return file.filename.lower().endswith((".pdf", ".docx"))
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """
+    Read an upload into memory. Starlette keeps uploads up to its spool threshold (1 MB by
+    default) in memory and rolls larger ones over to a temporary file, which is read off
+    the event loop here.
+    """
+    await file.seek(0)
+    return await file.read()
+
+
+async def read_uploads(files: List[UploadFile]):
+    """
+    Validate and read every upload.
+
+    Returns per-file results and error lines (filled in for rejected files)
+    and the (index, file_bytes, filename) items to process.
+    """
+    results: List[Dict[str, Any]] = [None] * len(files)
+    file_errors: List[Optional[str]] = [None] * len(files)
+    pending = []
+
+    for i, file in enumerate(files):
+        # Validate file type
+        if not is_supported_upload(file):
+            error_msg = f"File {file.filename} has unsupported type. Only PDF and DOCX are allowed."
+            logger.warning(error_msg)
+            file_errors[i] = error_msg
+            results[i] = {
+                "filename": file.filename,
+                "status": "error",
+                "content": {},
+                "error": error_msg
+            }
+            continue
+
+        try:
+            pending.append((i, await read_upload(file), file.filename))
+        except Exception as e:
+            error_msg = f"Error processing {file.filename}: {str(e)}"
+            logger.exception(error_msg)
+            file_errors[i] = error_msg
+            results[i] = {
+                "filename": file.filename,
+                "status": "error",
+                "content": {},
+                "error": str(e)
+            }
+
+    return results, file_errors, pending
+
+
+async def process_upload_bytes(file_bytes: bytes, filename: str,
+                               fields: Optional[List[str]] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Run process_single_file off the event loop and return its result and error line, if any."""
+    try:
+        # process_single_file blocks on rendering and the LLM call
+        result = await run_in_threadpool(process_single_file, file_bytes, filename, fields)
+    except Exception as e:
+        error_msg = f"Error processing {filename}: {str(e)}"
+        logger.exception(error_msg)
+        return {
+            "filename": filename,
+            "status": "error",
+            "content": {},
+            "error": str(e)
+        }, error_msg
+    if result["status"] != "success" and result["error"]:
+        return result, f"{filename}: {result['error']}"
+    return result, None
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse the comma separated fields query parameter; None means every field."""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in EXTRACTION_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def validate_upload_count(files: List[UploadFile]):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+
+    if len(files) > 10:  # Limit to prevent abuse
+        raise HTTPException(status_code=400, detail="Maximum 10 files allowed per request")
+
+
 @app.post("/process-multiple-files/", response_model=MultiProcessResponse)
 async def process_multiple_files_endpoint(
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    fields: Optional[str] = None
 ):
     """
     Process single or multiple PDF and DOCX files
@@ -112,73 +235,32 @@ async def process_multiple_files_endpoint(
     - Multiple files: Upload up to 10 files at once
     
     Supported formats: PDF, DOCX
+
+    Pass fields=email,phone_number,... to extract only those fields; contact-only
+    requests are answered from the text layer without an LLM call.
     """
     logger.info(f"Received files request: {len(files)} files")
+    validate_upload_count(files)
+    requested_fields = parse_fields(fields)
 
-    if not files:
-        raise HTTPException(status_code=400, detail="No files provided")
+    results: List[Dict[str, Any]] = [None] * len(files)
 
-    if len(files) > 10:  # Limit to prevent abuse
-        raise HTTPException(status_code=400, detail="Maximum 10 files allowed per request")
+    try:
+        # Validate and read each upload, then process them concurrently
+        results, file_errors, pending = await read_uploads(files)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
 
-    results = []
-    errors = []
-    successful_files = 0
-    failed_files = 0
-    temp_paths = []
+        async def process_upload(i: int, file_bytes: bytes, filename: str):
+            async with semaphore:
+                logger.info(f"Processing file {i+1}/{len(files)}: {filename}")
+                results[i], file_errors[i] = await process_upload_bytes(file_bytes, filename, requested_fields)
+                logger.info(f"File {i+1}/{len(files)} processed: {filename} - Status: {results[i]['status']}")
 
-    try:
-        # Process each file
-        for i, file in enumerate(files):
-            logger.info(f"Processing file {i+1}/{len(files)}: {file.filename}")
-
-            # Validate file type
-            if not file.filename.lower().endswith((".pdf", ".docx")):
-                error_msg = f"File {file.filename} has unsupported type. Only PDF and DOCX are allowed."
-                logger.warning(error_msg)
-                errors.append(error_msg)
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "content": {},
-                    "error": error_msg
-                })
-                failed_files += 1
-                continue
-
-            temp_path = None
-            try:
-                # Create temporary file
-                suffix = ".pdf" if file.filename.lower().endswith(".pdf") else ".docx"
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                    shutil.copyfileobj(file.file, temp_file)
-                    temp_path = temp_file.name
-                temp_paths.append(temp_path)
-
-                # Process the file
-                result = process_single_file(temp_path, file.filename)
-                results.append(result)
-
-                if result["status"] == "success":
-                    successful_files += 1
-                else:
-                    failed_files += 1
-                    if result["error"]:
-                        errors.append(f"{file.filename}: {result['error']}")
-
-                logger.info(f"File {i+1}/{len(files)} processed: {file.filename} - Status: {result['status']}")
-
-            except Exception as e:
-                error_msg = f"Error processing {file.filename}: {str(e)}"
-                logger.exception(error_msg)
-                errors.append(error_msg)
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "content": {},
-                    "error": str(e)
-                })
-                failed_files += 1
+        await asyncio.gather(*(process_upload(*item) for item in pending))
+
+        successful_files = sum(1 for result in results if result["status"] == "success")
+        failed_files = len(results) - successful_files
+        errors = [error for error in file_errors if error]
 
         response = {
             "status": "completed",
@@ -197,22 +279,119 @@ async def process_multiple_files_endpoint(
             status_code=500,
             content={
                 "status": "error",
-                "results": results,
+                "results": [result for result in results if result is not None],
                 "total_files": len(files),
-                "successful_files": successful_files,
-                "failed_files": failed_files,
+                "successful_files": sum(1 for result in results if result and result["status"] == "success"),
+                "failed_files": sum(1 for result in results if result and result["status"] != "success"),
                 "errors": [str(e)]
             }
         )
-    finally:
-        # Clean up all temporary files
-        for temp_path in temp_paths:
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                except Exception as e:
-                    logger.warning(f"Failed to delete temporary file {temp_path}: {e}")
-        logger.info("All temporary files cleaned up")
+
+
+@app.post("/process-multiple-files/stream")
+async def stream_multiple_files_endpoint(
+    files: List[UploadFile] = File(...),
+    format: str = "ndjson",
+    fields: Optional[str] = None
+):
+    """
+    Process single or multiple PDF and DOCX files, streaming each file's result as soon as it is ready
+
+    Records have the same shape as the results of /process-multiple-files/ and arrive in completion order.
+    The last record is a summary with total_files, successful_files, failed_files and errors.
+    Use format=ndjson (default) for newline-delimited JSON or format=sse for Server-Sent Events.
+    fields works as for /process-multiple-files/.
+    """
+    logger.info(f"Received streaming files request: {len(files)} files")
+    validate_upload_count(files)
+    requested_fields = parse_fields(fields)
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+
+    # Uploads are closed once the endpoint returns, so read them before streaming starts
+    results, file_errors, pending = await read_uploads(files)
+
+    def encode(event: str, record: Dict[str, Any]) -> str:
+        if format == "sse":
+            return f"event: {event}\ndata: {json.dumps(record)}\n\n"
+        return json.dumps(record) + "\n"
+
+    async def record_stream():
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+
+        async def process_upload(i: int, file_bytes: bytes, filename: str):
+            async with semaphore:
+                results[i], file_errors[i] = await process_upload_bytes(file_bytes, filename, requested_fields)
+                return results[i]
+
+        tasks = [asyncio.ensure_future(process_upload(*item)) for item in pending]
+        try:
+            for result in results:
+                if result is not None:
+                    yield encode("result", result)
+            for task in asyncio.as_completed(tasks):
+                yield encode("result", await task)
+
+            successful_files = sum(1 for result in results if result["status"] == "success")
+            yield encode("summary", {
+                "status": "completed",
+                "total_files": len(files),
+                "successful_files": successful_files,
+                "failed_files": len(results) - successful_files,
+                "errors": [error for error in file_errors if error]
+            })
+            logger.info(f"Streaming files processing completed. Success: {successful_files}")
+        finally:
+            # Client disconnects stop the stream early; don't leave queued work behind
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(record_stream(), media_type=media_type)
+
+
+@app.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_extraction_job(files: List[UploadFile] = File(...), fields: Optional[str] = None):
+    """
+    Queue any number of PDF and DOCX files for extraction and return a job id right away.
+    Poll /jobs/{job_id} for per-file status and /jobs/{job_id}/results for the results.
+    fields works as for /process-multiple-files/.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files provided")
+    requested_fields = parse_fields(fields)
+
+    # Queued files wait on disk, not in memory, until a worker picks them up
+    uploads = []
+    try:
+        for file in files:
+            path = await run_in_threadpool(spool_upload, file.file, file.filename) if is_supported_upload(file) else None
+            uploads.append((file.filename, path))
+    except Exception as e:
+        logger.exception(f"Failed to read uploads for job: {str(e)}")
+        for _, path in uploads:
+            remove_spooled(path)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    job_id = extraction_jobs.submit(uploads, requested_fields)
+    return {"job_id": job_id, "status": "queued", "total_files": len(files)}
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_extraction_job(job_id: str):
+    status = extraction_jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/results", response_model=MultiProcessResponse)
+async def get_extraction_job_results(job_id: str):
+    results = extraction_jobs.results(job_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return results
 
 if __name__ == "__main__":
     import uvicorn
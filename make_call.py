@@ -1,35 +1,22 @@
+import os
 import logging
-import time
 from datetime import datetime, timedelta
-from functools import wraps
 from fastapi import FastAPI, HTTPException, Request
-from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi.concurrency import run_in_threadpool
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
-from psycopg2.extras import RealDictCursor
-import psycopg2
-import requests
-from typing import Tuple, List, Dict
-
-# Retry decorator for database operations
-def retry_on_db_error(max_retries=3, delay=1):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    retries += 1
-                    if retries == max_retries:
-                        logging.error(f"Failed after {max_retries} retries: {str(e)}")
-                        raise
-                    logging.warning(f"Database operation failed, retrying ({retries}/{max_retries}): {str(e)}")
-                    time.sleep(delay)
-            return None
-        return wrapper
-    return decorator
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import PoolError
+import httpx
+from typing import Tuple, List, Dict, Optional
+from bland_client import BlandClient
+from db_pool import ConnectionPool, CONNECTION_ERRORS
+from quota_tracker import QuotaTracker
+from dial_queue import DialQueue, DialWorker, DIALED, QUOTA_EXCEEDED, RATE_LIMITED, FAILED
+from dial_governor import DialGovernor
+from webhook_workers import WebhookWorkers
+from intent_classifier import IntentClassifier, INTENT_MIN_CONFIDENCE
+from write_behind import WriteBehindBuffer, WRITE_BEHIND_PATH
+from webhook_dedup import WebhookDeduplicator, EventKey
 
 app = FastAPI()
 
@@ -38,94 +25,61 @@ BLAND_API_KEY = "org_0301c6c09e6f2613b52b17fb221b1b211abaa4e88525251a05982c0ccc8
 PATHWAY_ID = "aa324946-14c7-4e72-a68e-8ec4f44b7d88"
 CALL_URL = "https://api.bland.ai/v1/calls"
 WEBHOOK_URL = "https://94cd-103-241-232-74.ngrok-free.app/webhook"
+# Calls allowed in any rolling 24 hours
+DAILY_CALL_LIMIT = 2000
+# Whether the API process also runs the dial dispatcher; set to 0 to leave dialing to dial_worker.py
+DIAL_WORKER_IN_APP = os.getenv("DIAL_WORKER_IN_APP", "1") == "1"
 
-# Scheduler setup with better error handling
-def create_scheduler():
-    try:
-        jobstores = {
-            'default': SQLAlchemyJobStore(
-                url=DATABASE_URL
-            )
-        }
-        scheduler = BackgroundScheduler(
-            jobstores=jobstores,
-            job_defaults={
-                'misfire_grace_time': None,  # Run even if missed
-                'coalesce': True,
-                'max_instances': 1
-            }
-        )
-        
-        # Add error listener
-        def job_error_listener(event):
-            if event.exception:
-                logging.error(f"Job failed: {event.job_id}")
-                logging.error(f"Error: {str(event.exception)}", exc_info=event.exception)
-                
-        def job_executed_listener(event):
-            logging.info(f"Job executed: {event.job_id} at {datetime.now()}")
-                
-        scheduler.add_listener(job_error_listener, EVENT_JOB_ERROR)
-        scheduler.add_listener(job_executed_listener, EVENT_JOB_EXECUTED)
-        
-        # Print all current jobs
-        scheduler.print_jobs()
-        
-        scheduler.start()
-        logging.info(f"Scheduler started successfully at {datetime.now()}")
-        return scheduler
-    except Exception as e:
-        logging.error(f"Failed to create scheduler: {e}")
-        raise
+# Shared, pooled connections to the Bland API for the dialer and the webhook
+bland_client = BlandClient(api_key=BLAND_API_KEY, calls_url=CALL_URL)
+# Paces dials to what Bland accepts: calls/sec, requests in flight and backoff on 429/5xx
+dial_governor = DialGovernor()
 
-scheduler = create_scheduler()
-
-# Database connection helpers
-@retry_on_db_error(max_retries=3, delay=1)
-def get_database_connection():
-    try:
-        conn = psycopg2.connect(
-            DATABASE_URL,
-            connect_timeout=10,  # Wait up to 10 seconds for connection
-            keepalives=1,        # Enable keepalive
-            keepalives_idle=30,  # Send keepalive after 30 seconds of idle
-            keepalives_interval=10,  # Retry keepalive every 10 seconds
-            keepalives_count=3    # Retry 3 times before giving up
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"Database connection error: {e}")
-        raise
+# Pooled database connections, reused across requests and dial threads
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    connect_timeout=10,  # Wait up to 10 seconds for connection
+    keepalives=1,        # Enable keepalive
+    keepalives_idle=30,  # Send keepalive after 30 seconds of idle
+    keepalives_interval=10,  # Retry keepalive every 10 seconds
+    keepalives_count=3    # Retry 3 times before giving up
+)
 
 def execute_update(query, params):
-    conn = get_database_connection()
-    if not conn:
-        return False
-    cursor = conn.cursor()
     try:
-        cursor.execute(query, params)
-        conn.commit()
+        with db_pool.cursor() as cursor:
+            cursor.execute(query, params)
         return True
     except Exception as e:
         logging.error(f"DB update error: {e}")
-        conn.rollback()
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 # DB update functions
 def store_call_id(phone_number, user_id, call_id):
     return execute_update(
-        "UPDATE person_details_dummy SET call_id = %s WHERE sms_phone_numbers_used = %s AND id = %s",
+        "UPDATE person_details_dummy SET call_id = %s, called_at = NOW() WHERE sms_phone_numbers_used = %s AND id = %s",
         (call_id, phone_number, user_id)
     )
 
-def store_intent_and_summary(call_id, intent, summary):
-    return execute_update(
-        "UPDATE person_details_dummy SET intent = %s, summary = %s WHERE call_id = %s",
-        (intent, summary, call_id)
-    )
+def store_call_results(results: List[Dict]) -> None:
+    """Write a batch of enriched call results in one statement; raises so the buffer keeps them."""
+    with db_pool.cursor() as cursor:
+        # Details a call didn't report keep whatever is already stored
+        execute_values(
+            cursor,
+            """
+            UPDATE person_details_dummy AS pd
+            SET intent = v.intent, summary = v.summary, transcript = COALESCE(v.transcript, pd.transcript),
+                call_duration = COALESCE(v.duration, pd.call_duration),
+                disposition = COALESCE(v.disposition, pd.disposition), intent_source = v.intent_source
+            FROM (VALUES %s) AS v(call_id, intent, summary, transcript, duration, disposition, intent_source)
+            WHERE pd.call_id = v.call_id
+            """,
+            [(r['call_id'], r['intent'], r['summary'], r['transcript'], r['duration'], r['disposition'],
+              r['intent_source']) for r in results],
+            template="(%s, %s, %s, %s::text, %s::real, %s::text, %s)",
+            page_size=1000
+        )
 
 def update_call_schedule_time(user_id: str, schedule_time: datetime) -> bool:
     return execute_update(
@@ -133,116 +87,155 @@ def update_call_schedule_time(user_id: str, schedule_time: datetime) -> bool:
         (schedule_time, user_id)
     )
 
+def bulk_update_call_schedule_times(schedule: List[Tuple[str, datetime]]) -> bool:
+    """Set call_scheduled_at for many people in one transaction on one connection."""
+    if not schedule:
+        return True
+    try:
+        with db_pool.cursor() as cursor:
+            execute_values(
+                cursor,
+                """
+                UPDATE person_details_dummy AS pd
+                SET call_scheduled_at = v.scheduled_at
+                FROM (VALUES %s) AS v(id, scheduled_at)
+                WHERE pd.id = v.id
+                """,
+                schedule,
+                page_size=1000
+            )
+        return True
+    except Exception as e:
+        logging.error(f"Bulk schedule update error: {e}")
+        return False
+
 # Fetch person data
 def fetch_all_person_data():
-    conn = get_database_connection()
-    if not conn:
-        logging.error("Database connection failed in fetch_all_person_data")
-        return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        # First, let's count total records to help with debugging
-        cursor.execute("SELECT COUNT(*) as count FROM person_details_dummy")
-        result = cursor.fetchone()
-        total_count = result['count']
-        logging.info(f"Total records in person_details_dummy: {total_count}")
-
-        # Now fetch the actual data with less restrictive conditions
-        cursor.execute("""
-            WITH available_people AS (
-                SELECT pd.id, pd.full_name, pd.sms_phone_numbers_used,
-                    jd.job_title, jd.location, jd.estimated_pay,
-                    pd.call_id, pd.call_scheduled_at
-                FROM person_details_dummy pd
-                LEFT JOIN uniti_med_job_data jd ON pd.url = jd.url
-                WHERE pd.sms_phone_numbers_used IS NOT NULL 
-                AND pd.sms_phone_numbers_used != ''
-                AND NOT pd.job_id::text ~ '^\\s*\\S+\\s*$'  -- Only include records where job_id is completely blank
-            )
-            SELECT * FROM available_people
-            WHERE (
-                NOT call_id::text ~ '^\\s*\\S+\\s*$'  -- Check if call_id is completely blank
-                OR (call_id IS NOT NULL AND TRIM(call_id) != '' AND call_scheduled_at IS NULL)
-                OR (call_scheduled_at IS NOT NULL AND call_scheduled_at <= NOW())
-            )
-        """)
+        with db_pool.cursor(cursor_factory=RealDictCursor) as cursor:
+            # First, let's count total records to help with debugging
+            cursor.execute("SELECT COUNT(*) as count FROM person_details_dummy")
+            result = cursor.fetchone()
+            total_count = result['count']
+            logging.info(f"Total records in person_details_dummy: {total_count}")
 
-        results = cursor.fetchall()
-        
-        # Add detailed logging
-        logging.info(f"Found {len(results)} people available for calling")
-        if len(results) == 0:
-            # Log counts for each condition to help debug
+            # Now fetch the actual data with less restrictive conditions
             cursor.execute("""
-                SELECT 
-                    COUNT(*) FILTER (WHERE call_id IS NULL) as no_call_count,
-                    COUNT(*) FILTER (WHERE call_scheduled_at IS NULL) as no_schedule_count,
-                    COUNT(*) FILTER (WHERE call_scheduled_at < NOW() - INTERVAL '24 hours') as old_call_count
-                FROM person_details_dummy
-                WHERE sms_phone_numbers_used IS NOT NULL 
-                AND sms_phone_numbers_used != ''
+                WITH available_people AS (
+                    SELECT pd.id, pd.full_name, pd.sms_phone_numbers_used,
+                        jd.job_title, jd.location, jd.estimated_pay,
+                        pd.call_id, pd.call_scheduled_at
+                    FROM person_details_dummy pd
+                    LEFT JOIN uniti_med_job_data jd ON pd.url = jd.url
+                    WHERE pd.sms_phone_numbers_used IS NOT NULL 
+                    AND pd.sms_phone_numbers_used != ''
+                    AND NOT pd.job_id::text ~ '^\\s*\\S+\\s*$'  -- Only include records where job_id is completely blank
+                )
+                SELECT * FROM available_people
+                WHERE (
+                    NOT call_id::text ~ '^\\s*\\S+\\s*$'  -- Check if call_id is completely blank
+                    OR (call_id IS NOT NULL AND TRIM(call_id) != '' AND call_scheduled_at IS NULL)
+                    OR (call_scheduled_at IS NOT NULL AND call_scheduled_at <= NOW())
+                )
             """)
-            counts = cursor.fetchone()
-            logging.info(f"Detailed counts: {counts}")
+
+            results = cursor.fetchall()
+        
+            # Add detailed logging
+            logging.info(f"Found {len(results)} people available for calling")
+            if len(results) == 0:
+                # Log counts for each condition to help debug
+                cursor.execute("""
+                    SELECT 
+                        COUNT(*) FILTER (WHERE call_id IS NULL) as no_call_count,
+                        COUNT(*) FILTER (WHERE call_scheduled_at IS NULL) as no_schedule_count,
+                        COUNT(*) FILTER (WHERE call_scheduled_at < NOW() - INTERVAL '24 hours') as old_call_count
+                    FROM person_details_dummy
+                    WHERE sms_phone_numbers_used IS NOT NULL 
+                    AND sms_phone_numbers_used != ''
+                """)
+                counts = cursor.fetchone()
+                logging.info(f"Detailed counts: {counts}")
             
-        return results
+            return results
     except Exception as e:
         logging.error(f"Error fetching data: {e}")
         logging.exception("Full error details:")
         return []
-    finally:
-        cursor.close()
-        conn.close()
 
+def fetch_people_by_id(person_ids: List[str]) -> Dict[str, Dict]:
+    """Load the people for a batch of due dials in one query, keyed by id as text."""
+    if not person_ids:
+        return {}
+    with db_pool.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("""
+            SELECT pd.id, pd.full_name, pd.sms_phone_numbers_used,
+                jd.job_title, jd.location, jd.estimated_pay,
+                pd.call_id, pd.call_scheduled_at, pd.called_at
+            FROM person_details_dummy pd
+            LEFT JOIN uniti_med_job_data jd ON pd.url = jd.url
+            WHERE pd.id IN %s  -- quoted ids are untyped literals, so pd.id's index still applies
+            AND pd.sms_phone_numbers_used IS NOT NULL
+            AND pd.sms_phone_numbers_used != ''
+        """, (tuple(person_ids),))
+        return {str(person['id']): person for person in cursor.fetchall()}
 
-def get_24h_call_count() -> int:
-    """Get count of successful calls made in last 24 hours"""
-    conn = get_database_connection()
-    if not conn:
-        return 0
-    try:
-        cursor = conn.cursor()
-        # Count only successful calls (where call_id exists and was actually made)
+
+def load_24h_call_counts() -> List[Tuple[float, int]]:
+    """Calls placed in the last 24 hours, per minute of dialing, for seeding the quota tracker"""
+    with db_pool.cursor() as cursor:
+        # store_call_id stamps called_at when Bland accepts a call; created_at is when the person was added
         cursor.execute("""
-            SELECT COUNT(*)
+            SELECT EXTRACT(EPOCH FROM date_trunc('minute', called_at)), COUNT(*)
             FROM person_details_dummy
-            WHERE call_id IS NOT NULL 
-            AND call_id != '' 
-            AND created_at >= NOW() - INTERVAL '24 hours'
-            -- Don't check call_scheduled_at for counting as it's only for rescheduled calls
+            WHERE called_at >= NOW() - INTERVAL '24 hours'
+            GROUP BY 1
         """)
-        count = cursor.fetchone()[0]
-        return count
-    except Exception as e:
-        logging.error(f"Error counting 24h calls: {e}")
-        return 0
-    finally:
-        cursor.close()
-        conn.close()
+        return [(float(minute), count) for minute, count in cursor.fetchall()]
+
+dial_queue = DialQueue(db_pool)
+dial_worker: Optional[DialWorker] = None
+
+# Daily call quota, counted in memory and reconciled with the database in the background
+quota_tracker = QuotaTracker()
+quota_tracker.register("daily_calls", DAILY_CALL_LIMIT, loader=load_24h_call_counts)
+# Every dial must fit all of these; add per-pathway or per-caller-ID quotas here
+CALL_QUOTAS = ("daily_calls",)
+
+def get_24h_call_count() -> int:
+    """Get count of successful calls made in last 24 hours"""
+    return quota_tracker.count("daily_calls")
 
 def get_next_available_slot(current_time: datetime) -> datetime:
     """Get next available time slot based on 24h call count"""
     call_count = get_24h_call_count()
-    if call_count >= 2000:
+    if call_count >= DAILY_CALL_LIMIT:
         # If daily limit reached, schedule for next day at same time
         return current_time + timedelta(days=1)
     return current_time
 
+# Rules plus the optional trained model from INTENT_MODEL_PATH
+intent_classifier = IntentClassifier.from_path()
+
 # Call analysis
-def analyze_call_intent(call_id):
+async def classify_call_intent(call_id, transcript: Optional[str]) -> Tuple[str, str]:
+    """(intent, source): from the transcript when the local classifier is sure, else from Bland's analyze."""
+    if transcript:
+        prediction = intent_classifier.classify(transcript)
+        if prediction.confidence >= INTENT_MIN_CONFIDENCE:
+            return prediction.label, prediction.source
+    return await analyze_call_intent(call_id), "remote"
+
+async def analyze_call_intent(call_id):
     try:
-        response = requests.post(
-            f"{CALL_URL}/{call_id}/analyze",
-            json={
+        response = await bland_client.aanalyze_call(
+            call_id,
+            {
                 "goal": "Analyze caller's response to job opportunity",
                 "questions": [[
                     "Based on the caller's response, categorize their interest: Answer 'yes' if genuinely interested in the job, 'no' if not interested/declined, or 'later' if they said they're busy/call later/call back later/will call you back",
                     "string"
                 ]]
-            },
-            headers={
-                "Authorization": f"Bearer {BLAND_API_KEY}",
-                "Content-Type": "application/json"
             }
         )
         if response.status_code == 200:
@@ -254,152 +247,190 @@ def analyze_call_intent(call_id):
         logging.error(f"Exception analyzing call: {e}")
         return "error"
 
-# Get call summary
-def get_call_summary(call_id):
-    try:
-        response = requests.get(
-            f"{CALL_URL}/{call_id}",
-            headers={"Authorization": f"Bearer {BLAND_API_KEY}"}
-        )
-        return response.json().get("summary", "No summary available.") if response.status_code == 200 else "Error fetching summary."
-    except Exception as e:
-        logging.error(f"Exception while getting summary: {e}")
-        return "Error fetching summary."
+def call_details(call: Dict) -> Dict:
+    """Summary, transcript, duration (seconds) and disposition from a Bland call object; None where absent."""
+    transcript = call.get('concatenated_transcript')
+    if not transcript and call.get('transcripts'):
+        transcript = "\n".join(f"{t.get('user')}: {t.get('text')}" for t in call['transcripts'] if t.get('text'))
 
-# Make individual call
-def make_calls(person):
+    duration = None
     try:
-        logging.info(f"Starting call for person: {person.get('id')}")
-        # Check if we've hit the 24-hour call limit
-        call_count = get_24h_call_count()
-        current_time = datetime.now()
-        
-        logging.info(f"Current 24h call count: {call_count}")
-        if call_count >= 2000:
-            # Calculate next day same time
-            original_time = person.get('call_scheduled_at', current_time)
-            next_time = original_time + timedelta(days=1)
-            
-            # Reschedule the call for next day at same time
-            job_id = f"call_{person['id']}_{int(next_time.timestamp())}"
-            scheduler.add_job(
-                make_calls,
-                trigger='date',
-                run_date=next_time,
-                args=[person],
-                id=job_id
-            )
-            update_call_schedule_time(person['id'], next_time)
-            logging.info(f"24-hour limit reached (2000 calls). Rescheduling call for {person['id']} to {next_time}")
-            return False
+        if call.get('corrected_duration') not in (None, ''):
+            duration = float(call['corrected_duration'])
+        elif call.get('call_length') is not None:
+            duration = float(call['call_length']) * 60  # call_length is in minutes
+    except (TypeError, ValueError):
+        pass
 
-        phone_number = person['sms_phone_numbers_used'].strip()
-        pay = str(person.get('estimated_pay', '')).replace('$', '').replace(',', '')
-            
-        logging.info(f"Making call to {phone_number} at {current_time}")
+    return {
+        "summary": call.get('summary') or None,
+        "transcript": transcript or None,
+        "duration": duration,
+        "disposition": call.get('disposition_tag') or call.get('answered_by') or None
+    }
+
+# Keys in a Bland call object that carry each field worth a round trip when the webhook lacks it.
+# Duration and disposition are left out: a call object without them won't have them on a GET either.
+FETCHABLE_DETAIL_KEYS = {
+    "summary": ("summary",),
+    "transcript": ("concatenated_transcript", "transcripts"),
+}
+
+# Get call details, from the webhook body where it has them
+async def get_call_details(call_id, event: Dict) -> Tuple[Dict, bool]:
+    """The call's details, and False when a needed fetch from Bland failed."""
+    details = call_details(event)
+    # A key sent as null means Bland has nothing for it; only an absent key is worth asking for
+    missing = [field for field, keys in FETCHABLE_DETAIL_KEYS.items() if not any(key in event for key in keys)]
+    fetch_error = False
+    if missing:
+        # Only now is the extra round trip to Bland worth it
         try:
-            response = requests.post(
-                CALL_URL,
-                json={
-                    "phone_number": phone_number,
-                    "pathway_id": PATHWAY_ID,
-                    "pronunciation_guide": {"$": "dollars"},
-                    "voice": "85a2c852-2238-4651-acf0-e5cbe02186f2",
-                    "wait_for_greeting": True,
-                    "noise_cancellation": True,
-                    "webhook": WEBHOOK_URL,
-                    "request_data": {
-                        "full_name": person.get('full_name'),
-                        "job_title": person.get('job_title'),
-                        "location": person.get('location'),
-                        "pay": pay,
-                        "user_name": person.get('id')
-                    }
-                },
-                headers={
-                    "Authorization": f"Bearer {BLAND_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                timeout=30  # Add timeout to prevent hanging
-            )
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
+            response = await bland_client.aget_call(call_id)
             if response.status_code == 200:
-                call_id = response.json().get('call_id')
-                if call_id:
-                    store_call_id(phone_number, person.get('id'), call_id)
-                    logging.info(f"Successfully initiated call for {person.get('id')} with call_id: {call_id}")
-                    return True
-                else:
-                    logging.error("Call API returned 200 but no call_id in response")
-                    return False
+                fetched = call_details(response.json())
+                details.update({field: value for field, value in fetched.items()
+                                if details[field] is None and value is not None})
             else:
-                logging.error(f"Call API error. Status: {response.status_code}, Response: {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            logging.error(f"API request failed: {str(e)}")
-            return False
-            
+                fetch_error = True
+                logging.error(f"Fetching call {call_id} failed with status {response.status_code}")
+        except Exception as e:
+            fetch_error = True
+            logging.error(f"Exception while getting call details: {e}")
+    if details["summary"] is None:
+        details["summary"] = "Error fetching summary." if fetch_error else "No summary available."
+    return details, not fetch_error
+
+def call_request(person, phone_number: str, pay: str) -> Dict:
+    return {
+        "phone_number": phone_number,
+        "pathway_id": PATHWAY_ID,
+        "pronunciation_guide": {"$": "dollars"},
+        "voice": "85a2c852-2238-4651-acf0-e5cbe02186f2",
+        "wait_for_greeting": True,
+        "noise_cancellation": True,
+        "webhook": WEBHOOK_URL,
+        "request_data": {
+            "full_name": person.get('full_name'),
+            "job_title": person.get('job_title'),
+            "location": person.get('location'),
+            "pay": pay,
+            "user_name": person.get('id')
+        }
+    }
+
+# Place one call within the call quotas
+def dial_person(person) -> str:
+    """Returns DIALED, QUOTA_EXCEEDED, RATE_LIMITED or FAILED; only a dial that got a call_id uses quota."""
+    # Take a slot from the 24-hour call limit, in memory
+    if not quota_tracker.try_acquire(*CALL_QUOTAS):
+        return QUOTA_EXCEEDED
+    dialed = False
+    try:
+        phone_number = person['sms_phone_numbers_used'].strip()
+        pay = str(person.get('estimated_pay', '')).replace('$', '').replace(',', '')
+
+        with dial_governor.slot():
+            logging.info(f"Making call to {phone_number} at {datetime.now()}")
+            try:
+                response = bland_client.start_call(call_request(person, phone_number, pay))
+            except httpx.TransportError as e:
+                dial_governor.record_error(e)
+                raise
+            dial_governor.record(response)
+        if response.status_code == 429:
+            logging.warning(f"Bland API rate limited the call for {person.get('id')}")
+            return RATE_LIMITED
+        response.raise_for_status()  # Raise an exception for bad status codes
+
+        if response.status_code == 200:
+            call_id = response.json().get('call_id')
+            if call_id:
+                dialed = True
+                store_call_id(phone_number, person.get('id'), call_id)
+                logging.info(f"Successfully initiated call for {person.get('id')} with call_id: {call_id}")
+                return DIALED
+            logging.error("Call API returned 200 but no call_id in response")
+            return FAILED
+        logging.error(f"Call API error. Status: {response.status_code}, Response: {response.text}")
+        return FAILED
+
+    except httpx.HTTPError as e:
+        logging.error(f"API request failed: {str(e)}")
+        return FAILED
+    finally:
+        # A dial that didn't go through doesn't count against the limit
+        if not dialed:
+            quota_tracker.release(*CALL_QUOTAS)
+
+# Dispatcher entry point; the person was loaded in a batch when their dial fell due
+def dial_queued_person(person) -> Tuple[str, Optional[datetime]]:
+    logging.info(f"Starting queued call for person: {person.get('id')}")
+    outcome = dial_person(person)
+    if outcome == QUOTA_EXCEEDED:
+        # Next day at the same time
+        next_time = (person.get('call_scheduled_at') or datetime.now()) + timedelta(days=1)
+        update_call_schedule_time(person['id'], next_time)
+        logging.info(f"24-hour limit reached ({DAILY_CALL_LIMIT} calls). Rescheduling call for {person['id']} to {next_time}")
+        return outcome, next_time
+    if outcome == RATE_LIMITED:
+        return outcome, datetime.now() + timedelta(seconds=dial_governor.retry_delay())
+    return outcome, None
+
+def dialed_since_queued(row: Dict, person: Dict) -> bool:
+    """A queue row places one call, so a call stored after the row was created came from it."""
+    return person.get('called_at') is not None and person['called_at'] >= row['created_at']
+
+# Target of APScheduler jobs created before the dial queue; migrate_scheduler_jobs moves
+# those into the queue, but a job store restored from backup still needs this to resolve
+def make_calls(person):
+    try:
+        outcome, next_time = dial_queued_person(person)
+        if outcome == QUOTA_EXCEEDED:
+            dial_queue.enqueue_many([(person['id'], next_time, 0)])
+        return outcome == DIALED
     except Exception as e:
         logging.error(f"Error making call: {str(e)}", exc_info=True)
         return False
-    
-    return True
+
+def plan_call_schedule(people: List[Dict], call_count: int, start_time: datetime) -> List[Tuple[Dict, datetime]]:
+    """
+    Assign each person a call time a minute from now; the dial governor paces the actual dials.
+    People beyond what is left of the 24h quota go to the same time the next day.
+    """
+    remaining = max(0, DAILY_CALL_LIMIT - call_count)
+    slot = start_time + timedelta(minutes=1)
+    return [(person, slot if i < remaining else slot + timedelta(days=1)) for i, person in enumerate(people)]
+
 # Endpoint to initiate all calls concurrently
 @app.post("/initiate-calls", response_model=dict)
-async def initiate_calls():
+def initiate_calls():
+    # A plain def runs in FastAPI's threadpool, so the campaign's DB work never blocks the webhook's event loop
     try:
         people = fetch_all_person_data()
         if not people:
             return {"message": "No person details found in database"}
 
+        # One quota read for the whole campaign; slots are handed out in memory
+        current_time = datetime.now()
+        schedule = plan_call_schedule(people, get_24h_call_count(), current_time)
+
+        # Every schedule time is written in one transaction before any dial is queued
+        if not bulk_update_call_schedule_times([(person['id'], next_time) for person, next_time in schedule]):
+            raise HTTPException(status_code=500, detail="Failed to store call schedule times")
+
+        # One multi-row insert of (id, due time); people are re-read in batches when due
+        dial_queue.enqueue_many([(person['id'], next_time, 0) for person, next_time in schedule])
+        if dial_worker is not None:
+            dial_worker.wake()
+
         scheduled_counts = {}
         total_scheduled = 0
-        current_time = datetime.now()
-        
-        # Schedule calls for each person with 1 minute delay
-        for person in people:
-            call_count = get_24h_call_count()
-            if call_count >= 2000:
-                # If we hit the limit, schedule for next day
-                next_time = current_time + timedelta(days=1)
-            else:
-                # Schedule call for 1 minute later
-                next_time = current_time + timedelta(minutes=1)
-            
-            job_id = f"call_{person['id']}_{int(next_time.timestamp())}"
-            
-            # Remove any existing job with the same ID
-            if job_id in scheduler.get_jobs():
-                scheduler.remove_job(job_id)
-            
-            # Schedule the new job
-            job = scheduler.add_job(
-                make_calls,
-                trigger='date',
-                run_date=next_time,
-                args=[person],
-                id=job_id,
-                replace_existing=True
-            )
-            
-            logging.info(f"Scheduled job {job_id} for {next_time}")
-            
-            # Update the database with the scheduled time
-            update_call_schedule_time(person['id'], next_time)
+        for person, next_time in schedule:
             schedule_str = next_time.strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Track counts
             scheduled_counts[schedule_str] = scheduled_counts.get(schedule_str, 0) + 1
             total_scheduled += 1
-            
-            # Add small delay between schedules to spread out the load
-            current_time = current_time + timedelta(seconds=1)
-
-        # Log all scheduled jobs
-        logging.info("Currently scheduled jobs:")
-        scheduler.print_jobs()
+        logging.info(f"Scheduled {total_scheduled} calls starting {schedule[0][1] if schedule else current_time}")
         
         # Prepare response message
         response_messages = [
@@ -417,66 +448,173 @@ async def initiate_calls():
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-# Webhook endpoint to process individual call responses
+def migrate_scheduler_jobs() -> int:
+    """Move per-person APScheduler jobs left from before the dial queue into it, keeping their run times."""
+    jobstore = SQLAlchemyJobStore(url=DATABASE_URL)
+    jobstore.start(None, 'default')
+    try:
+        jobs = [job for job in jobstore.get_all_jobs() if job.func_ref.endswith(':make_calls')]
+        dial_queue.enqueue_many([(job.args[0]['id'], job.next_run_time, 0) for job in jobs])
+        for job in jobs:
+            jobstore.remove_job(job.id)
+    finally:
+        jobstore.shutdown()
+    if jobs:
+        logging.info(f"Moved {len(jobs)} scheduled calls from APScheduler to the dial queue")
+    return len(jobs)
+
+
+def start_dial_worker() -> DialWorker:
+    global dial_worker
+    # called_at is what stops a requeued row from dialing the same person twice
+    if not initialize_database():
+        raise RuntimeError("Database schema could not be initialized")
+    dial_queue.create_table()
+    try:
+        migrate_scheduler_jobs()
+    except Exception as e:
+        logging.error(f"Failed to migrate APScheduler jobs: {e}")
+    dial_worker = DialWorker(dial_queue, dial_queued_person, fetch_people_by_id, already_dialed=dialed_since_queued)
+    dial_worker.start()
+    return dial_worker
+
+
+# Bland retries deliveries; each (call_id, event type) is enriched once
+webhook_dedup = WebhookDeduplicator(db_pool)
+
+def webhook_event_key(event: Dict) -> EventKey:
+    return str(event['call_id']), str(event.get('event') or event.get('status') or 'completed')
+
+# Completed-call enrichment, run after the webhook has been acknowledged
+async def enrich_call(event: Dict):
+    call_id = event['call_id']
+    key = webhook_event_key(event)
+    if not await run_in_threadpool(webhook_dedup.claim, key):
+        logging.info(f"Skipping webhook for call {call_id}, already processed elsewhere")
+        return
+    try:
+        details, fetched = await get_call_details(call_id, event)
+        intent, intent_source = await classify_call_intent(call_id, details["transcript"])
+        # A local append; the flusher batches it into the database
+        call_results.add(call_id, {"call_id": call_id, "intent": intent, "intent_source": intent_source, **details})
+        complete = intent != "error" and fetched
+    except Exception as e:
+        logging.error(f"Enriching call {call_id} failed: {e}")
+        complete = False
+    except BaseException:
+        # Cancelled at shutdown; a later delivery must not be dropped as a duplicate
+        await run_in_threadpool(webhook_dedup.release, key)
+        raise
+    if not complete:
+        # The webhook was acknowledged, so Bland won't redeliver it; retry here once the API recovers
+        await run_in_threadpool(webhook_dedup.release, key)
+        delay = webhook_workers.retry_later(key, event)
+        if delay is None:
+            logging.error(f"Giving up on call {call_id} after {webhook_workers.max_retries} retries; its result stays incomplete")
+        else:
+            logging.warning(f"Incomplete result for call {call_id}; retrying enrichment in {delay:.0f}s")
+        return
+    webhook_workers.completed(key)
+    await run_in_threadpool(webhook_dedup.done, key)
+    logging.info(f"Buffered intent '{intent}' ({intent_source}) for call {call_id}")
+
+webhook_workers = WebhookWorkers(enrich_call)
+# Call results survive a slow or unreachable database and a restart, and reach it in batches.
+# The columns they fill are created before the first flush; rows the database rejects are set aside
+call_results = WriteBehindBuffer(
+    WRITE_BEHIND_PATH, store_call_results, name="call-results",
+    transient_errors=CONNECTION_ERRORS + (PoolError,), prepare=lambda: initialize_database()
+)
+
+
+@app.on_event("startup")
+async def start_dialing():
+    try:
+        webhook_dedup.create_table()
+    except Exception as e:
+        logging.error(f"Failed to create webhook dedup table: {e}")
+    # Runs initialize_database before the flusher starts, so `uvicorn make_call:app` has the columns too
+    await run_in_threadpool(call_results.start)
+    webhook_workers.start()
+    if DIAL_WORKER_IN_APP:
+        start_dial_worker()
+
+
+@app.on_event("shutdown")
+async def close_connections():
+    if dial_worker is not None:
+        dial_worker.stop()
+    # Finish queued enrichments while the API client and database are still open
+    await webhook_workers.stop()
+    await bland_client.aclose()
+    call_results.stop()
+    quota_tracker.stop()
+    db_pool.close()
+
+
+# Webhook endpoint for completed calls; acknowledges at once and enriches in the background
 @app.post("/webhook")
 async def webhook(request: Request):
     try:
         data = await request.json()
-        call_id = data.get('call_id')
-        phone_number = data.get('to', 'Unknown')
-        if call_id:
-            intent = analyze_call_intent(call_id)
-            summary = get_call_summary(call_id)
-            store_intent_and_summary(call_id, intent, summary)
-            return {
-                "message": "Webhook processed successfully",
-                "call_id": call_id,
-                "phone_number": phone_number,
-                "intent": intent,
-                "summary": summary
-            }
-        return {"message": "No call_id found", "intent": "unknown", "summary": None}
+        if not isinstance(data, dict):
+            raise ValueError("Webhook body must be a JSON object")
     except Exception as e:
         logging.error(f"Webhook processing error: {e}")
-        return {
-            "message": "Error processing webhook",
-            "error": str(e),
-            "intent": "error",
-            "summary": None
-        }
+        raise HTTPException(status_code=400, detail=f"Invalid webhook payload: {str(e)}")
+
+    call_id = data.get('call_id')
+    phone_number = data.get('to', 'Unknown')
+    if not call_id:
+        return {"message": "No call_id found", "intent": "unknown", "summary": None}
+    # Retries and concurrent duplicates stop here, before any API call or database write
+    key = webhook_event_key(data)
+    if webhook_dedup.seen(key):
+        return {"message": "Duplicate webhook ignored", "call_id": call_id, "phone_number": phone_number}
+    # Only refused when the backlog is full; Bland retries the delivery later
+    if not webhook_workers.submit(data):
+        webhook_dedup.forget(key)
+        raise HTTPException(status_code=503, detail="Webhook backlog full, retry later")
+    return {
+        "message": "Webhook accepted",
+        "call_id": call_id,
+        "phone_number": phone_number
+    }
 
 # Database initialization
 def initialize_database():
     """Initialize database schema with required columns"""
-    conn = get_database_connection()
-    if not conn:
-        return False
-    cursor = conn.cursor()
     try:
-        # Add call_scheduled_at column if it doesn't exist
-        cursor.execute("""
-            DO $$ 
-            BEGIN
-                IF NOT EXISTS (
-                    SELECT 1 
-                    FROM information_schema.columns 
-                    WHERE table_name='person_details_dummy' 
-                    AND column_name='call_scheduled_at'
-                ) THEN
-                    ALTER TABLE person_details_dummy ADD COLUMN call_scheduled_at TIMESTAMP;
-                END IF;
-            END $$;
-        """)
-        conn.commit()
+        with db_pool.cursor() as cursor:
+            # Add call_scheduled_at column if it doesn't exist
+            cursor.execute("""
+                DO $$ 
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 
+                        FROM information_schema.columns 
+                        WHERE table_name='person_details_dummy' 
+                        AND column_name='call_scheduled_at'
+                    ) THEN
+                        ALTER TABLE person_details_dummy ADD COLUMN call_scheduled_at TIMESTAMP;
+                    END IF;
+                END $$;
+            """)
+            # Call details taken from the completion webhook
+            cursor.execute("""
+                ALTER TABLE person_details_dummy
+                    ADD COLUMN IF NOT EXISTS transcript TEXT,
+                    ADD COLUMN IF NOT EXISTS call_duration REAL,
+                    ADD COLUMN IF NOT EXISTS disposition TEXT,
+                    ADD COLUMN IF NOT EXISTS intent_source TEXT,
+                    ADD COLUMN IF NOT EXISTS called_at TIMESTAMPTZ;
+                CREATE INDEX IF NOT EXISTS person_details_dummy_called_at ON person_details_dummy (called_at);
+            """)
         logging.info("Database schema initialized successfully")
         return True
     except Exception as e:
         logging.error(f"Error initializing database schema: {e}")
-        conn.rollback()
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
 # Main app runner
 if __name__ == "__main__":
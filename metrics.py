@@ -0,0 +1,36 @@
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Rendering and encoding are per page/image, the LLM and parse stages per document
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+OPEN_SECONDS = Histogram(
+    "extraction_open_seconds", "Time to open a PDF or DOCX document", buckets=STAGE_BUCKETS
+)
+RENDER_SECONDS = Histogram(
+    "extraction_render_seconds", "Time to rasterize one PDF page", buckets=STAGE_BUCKETS
+)
+ENCODE_SECONDS = Histogram(
+    "extraction_encode_seconds", "Time to encode and base64 one page or image", buckets=STAGE_BUCKETS
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "extraction_llm_queue_seconds", "Time an LLM call waited for rate limit budget", buckets=LLM_BUCKETS
+)
+LLM_SECONDS = Histogram(
+    "extraction_llm_seconds", "LLM call latency, excluding rate limit waits", buckets=LLM_BUCKETS
+)
+PARSE_SECONDS = Histogram(
+    "extraction_parse_seconds", "Time to parse JSON out of an LLM response", buckets=STAGE_BUCKETS
+)
+
+PAGES = Counter("extraction_pages_total", "PDF pages processed", ["source"])
+BYTES_SENT = Counter("extraction_llm_bytes_sent_total", "Text and image payload bytes sent to the LLM")
+TOKENS = Counter("extraction_llm_tokens_total", "Tokens reported by the LLM", ["type"])
+LLM_RATE_LIMITED = Counter("extraction_llm_rate_limited_total", "LLM calls rejected with 429")
+CACHE_LOOKUPS = Counter("extraction_cache_lookups_total", "Extraction cache lookups", ["result"])
+FAILURES = Counter("extraction_failures_total", "Failed extractions", ["error_type"])
+
+
+def latest():
+    """Current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
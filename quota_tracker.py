@@ -0,0 +1,219 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How often every quota is re-read from its source of truth
+QUOTA_RECONCILE_SECONDS = float(os.getenv("QUOTA_RECONCILE_SECONDS", "300"))
+# Width of one counting bucket; usage expires from the window a bucket at a time
+QUOTA_BUCKET_SECONDS = int(os.getenv("QUOTA_BUCKET_SECONDS", "60"))
+# First wait before a failed load is tried again; it doubles up to the reconcile interval
+QUOTA_LOAD_RETRY_SECONDS = float(os.getenv("QUOTA_LOAD_RETRY_SECONDS", "5"))
+# With this few left in memory a quota is re-read before each acquire, so processes sharing
+# the source see each other's usage before spending the last of it
+QUOTA_SYNC_MARGIN = int(os.getenv("QUOTA_SYNC_MARGIN", "20"))
+
+# A loader returns (bucket epoch seconds, count) pairs for usage inside the window
+QuotaLoader = Callable[[], Iterable[Tuple[float, int]]]
+
+
+class SlidingWindowQuota:
+    """Usage over the last window_seconds, kept as per-bucket counts. Not thread-safe on its own."""
+
+    def __init__(self, limit: int, window_seconds: int = 24 * 3600, bucket_seconds: int = QUOTA_BUCKET_SECONDS):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self._buckets: Deque[List[int]] = deque()  # [bucket_start, count], oldest first
+        self._total = 0
+        # [at, amount] for usage added here since the last merge, which the source may not have yet
+        self._unreconciled: List[List[float]] = []
+
+    def _bucket_start(self, at: float) -> int:
+        return int(at // self.bucket_seconds) * self.bucket_seconds
+
+    def _expire(self, now: float):
+        horizon = now - self.window_seconds
+        expired = False
+        while self._buckets and self._buckets[0][0] + self.bucket_seconds <= horizon:
+            self._total -= self._buckets.popleft()[1]
+            expired = True
+        if expired:
+            # Expired usage can no longer be refunded either
+            self._unreconciled = [entry for entry in self._unreconciled if self._bucket_start(entry[0]) + self.bucket_seconds > horizon]
+
+    def count(self, now: Optional[float] = None) -> int:
+        self._expire(now or time.time())
+        return self._total
+
+    def add(self, amount: int = 1, at: Optional[float] = None):
+        at = at or time.time()
+        self._add_to_bucket(amount, at)
+        self._unreconciled.append([at, amount])
+
+    def refund(self, amount: int = 1):
+        """
+        Take back usage added since the last merge. Usage merged away already came from the
+        source of truth, which never recorded a dial that didn't happen, so there is nothing to undo.
+        """
+        for entry in reversed(self._unreconciled):
+            taken = min(entry[1], amount)
+            if taken <= 0:
+                continue
+            entry[1] -= taken
+            self._add_to_bucket(-taken, entry[0])
+            amount -= taken
+            if not amount:
+                break
+        self._unreconciled = [entry for entry in self._unreconciled if entry[1]]
+
+    def _add_to_bucket(self, amount: int, at: float):
+        start = self._bucket_start(at)
+        if self._buckets and self._buckets[-1][0] == start:
+            self._buckets[-1][1] += amount
+        elif not self._buckets or self._buckets[-1][0] < start:
+            self._buckets.append([start, amount])
+        else:
+            # Backdated usage (seeding, refunds); rare enough for a linear insert
+            for bucket in self._buckets:
+                if bucket[0] == start:
+                    bucket[1] += amount
+                    break
+            else:
+                self._buckets.append([start, amount])
+                self._buckets = deque(sorted(self._buckets))
+        self._total += amount
+
+    def merge(self, usage: Iterable[Tuple[float, int]], loaded_at: float):
+        """
+        Reconcile with counts the source of truth returned for a load started at loaded_at.
+        The source replaces everything added before that; only usage added here since then is
+        kept on top, so nothing is counted twice even though the two bucket by different times.
+        """
+        loaded: Dict[int, int] = {}
+        for at, count in usage:
+            start = self._bucket_start(at)
+            loaded[start] = loaded.get(start, 0) + int(count)
+        self._buckets = deque([start, count] for start, count in sorted(loaded.items()))
+        self._total = sum(loaded.values())
+        self._unreconciled = [entry for entry in self._unreconciled if entry[0] >= loaded_at]
+        for at, amount in self._unreconciled:
+            self._add_to_bucket(amount, at)
+        self._expire(time.time())
+
+
+class QuotaTracker:
+    """
+    Named sliding-window quotas (e.g. calls per day overall, per pathway or per caller ID).
+
+    Each quota is seeded from its loader on first use and re-read in the background every
+    QUOTA_RECONCILE_SECONDS, so checks on the dial path don't touch the database until a
+    quota is within sync_margin of its limit. A failed load is retried with backoff, and
+    until it succeeds the quota counts only what this process added.
+    """
+
+    def __init__(self, reconcile_seconds: float = QUOTA_RECONCILE_SECONDS, sync_margin: int = QUOTA_SYNC_MARGIN):
+        self.reconcile_seconds = reconcile_seconds
+        self.sync_margin = sync_margin
+        self._quotas: Dict[str, SlidingWindowQuota] = {}
+        self._loaders: Dict[str, Optional[QuotaLoader]] = {}
+        self._seeded = set()
+        # name -> (time.monotonic() before which it isn't loaded again, current retry delay)
+        self._retry_at: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, limit: int, window_seconds: int = 24 * 3600,
+                 loader: Optional[QuotaLoader] = None):
+        with self._lock:
+            self._quotas[name] = SlidingWindowQuota(limit, window_seconds)
+            self._loaders[name] = loader
+            self._seeded.discard(name)
+
+    def _load(self, name: str) -> bool:
+        loader = self._loaders.get(name)
+        if loader is None:
+            return True
+        retry_at, delay = self._retry_at.get(name, (0.0, 0.0))
+        if time.monotonic() < retry_at:
+            return False
+        # Usage added after this moment may be missing from what the loader returns
+        loaded_at = time.time()
+        try:
+            usage = list(loader())
+        except Exception as e:
+            delay = min(max(self.reconcile_seconds, QUOTA_LOAD_RETRY_SECONDS), max(QUOTA_LOAD_RETRY_SECONDS, delay * 2))
+            self._retry_at[name] = (time.monotonic() + delay, delay)
+            logger.error(f"Failed to load quota {name}, retrying in {delay:.0f}s: {e}")
+            return False
+        self._retry_at.pop(name, None)
+        with self._lock:
+            self._quotas[name].merge(usage, loaded_at)
+        return True
+
+    def _ensure_seeded(self, names: Iterable[str]):
+        for name in names:
+            if name not in self._quotas:
+                raise KeyError(f"Unknown quota: {name}")
+            if name not in self._seeded and self._load(name):
+                self._seeded.add(name)
+        self._start_reconciler()
+
+    def count(self, name: str) -> int:
+        self._ensure_seeded([name])
+        with self._lock:
+            return self._quotas[name].count()
+
+    def remaining(self, name: str) -> int:
+        self._ensure_seeded([name])
+        with self._lock:
+            quota = self._quotas[name]
+            return max(0, quota.limit - quota.count())
+
+    def try_acquire(self, *names: str, amount: int = 1) -> bool:
+        """Take amount from every named quota, or from none of them if any would go over."""
+        self._ensure_seeded(names)
+        for name in names:
+            with self._lock:
+                quota = self._quotas[name]
+                near_limit = quota.limit - quota.count() <= self.sync_margin
+            if near_limit:
+                self._load(name)
+        with self._lock:
+            now = time.time()
+            quotas = [self._quotas[name] for name in names]
+            if any(quota.count(now) + amount > quota.limit for quota in quotas):
+                return False
+            for quota in quotas:
+                quota.add(amount, now)
+            return True
+
+    def release(self, *names: str, amount: int = 1):
+        """Give back usage taken by try_acquire for a dial that didn't happen."""
+        with self._lock:
+            for name in names:
+                self._quotas[name].refund(amount)
+
+    def reconcile(self):
+        for name in list(self._quotas):
+            if self._load(name):
+                self._seeded.add(name)
+
+    def _start_reconciler(self):
+        with self._lock:
+            if self._thread is not None or self.reconcile_seconds <= 0:
+                return
+            self._thread = threading.Thread(target=self._run, name="quota-reconciler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.reconcile_seconds):
+            self.reconcile()
+
+    def stop(self):
+        self._stop.set()
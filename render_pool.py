@@ -0,0 +1,175 @@
+import os
+import math
+import time
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes for page rendering and image encoding, 0 renders in the calling thread
+RENDER_POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", str(os.cpu_count() or 1)))
+# Pages handed to a worker per task, each task opens the PDF once
+RENDER_PAGES_PER_TASK = int(os.getenv("RENDER_PAGES_PER_TASK", "4"))
+# Raw pixel memory one document may hold across its in-flight pages; pages that would
+# exceed their share are rendered at a lower zoom
+RENDER_MEMORY_BUDGET = int(os.getenv("RENDER_MEMORY_BUDGET", str(128 * 1024 * 1024)))
+# A page briefly exists as both a pixmap and a PIL image, 3 bytes per pixel each
+BYTES_PER_RENDERED_PIXEL = 6
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Return the shared process pool, created on first use."""
+    global _pool
+    if RENDER_POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn keeps workers free of the server's threads and open sockets
+            _pool = ProcessPoolExecutor(
+                max_workers=RENDER_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Render pool started with {RENDER_POOL_WORKERS} workers")
+        return _pool
+
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+            logger.info("Render pool shut down")
+
+
+def _observe_pages(encoded_pages: Iterable[Tuple[str, float, float]]) -> Iterator[str]:
+    # Workers time themselves; record here, in the process that serves /metrics
+    for data_url, render_seconds, encode_seconds in encoded_pages:
+        metrics.RENDER_SECONDS.observe(render_seconds)
+        metrics.ENCODE_SECONDS.observe(encode_seconds)
+        yield data_url
+
+
+def max_page_pixels(pages_in_flight: int, memory_budget: int = RENDER_MEMORY_BUDGET) -> Optional[int]:
+    """Pixels one page may have so that every page rendering at once fits the memory budget."""
+    if memory_budget <= 0:
+        return None
+    return memory_budget // (BYTES_PER_RENDERED_PIXEL * max(1, pages_in_flight))
+
+
+def cap_zoom(zoom: float, width_pt: float, height_pt: float, max_pixels: Optional[int]) -> float:
+    if not max_pixels or width_pt * height_pt * zoom * zoom <= max_pixels:
+        return zoom
+    return math.sqrt(max_pixels / (width_pt * height_pt))
+
+
+def iter_pdf_pages(source: Union[str, bytes], page_numbers: Sequence[int], budget: Optional[int] = None,
+                   zoom: Optional[float] = None, max_pixels: Optional[int] = None) -> Iterator[Tuple[str, float, float]]:
+    """Render and encode pages one at a time, yielding (data_url, render_seconds, encode_seconds)."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+    from image_encoding import choose_zoom, encode_image
+
+    if isinstance(source, (bytes, bytearray)):
+        pdf_document = fitz.open(stream=source, filetype="pdf")
+    else:
+        pdf_document = fitz.open(source)
+    try:
+        for page_num in page_numbers:
+            render_start = time.perf_counter()
+            page = pdf_document[page_num]
+            page_zoom = zoom or choose_zoom(page.rect.width, page.rect.height, len(page.get_text("text").strip()))
+            page_zoom = cap_zoom(page_zoom, page.rect.width, page.rect.height, max_pixels)
+            pix = page.get_pixmap(matrix=fitz.Matrix(page_zoom, page_zoom), alpha=False)
+            image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+            pix = None
+            # MuPDF keeps decoded page images in its store; every page of a scan has its own, so
+            # left alone the store grows with the page count
+            fitz.TOOLS.store_shrink(100)
+            encode_start = time.perf_counter()
+            data_url = encode_image(image, budget)
+            image = None
+            yield data_url, encode_start - render_start, time.perf_counter() - encode_start
+    finally:
+        pdf_document.close()
+
+
+def render_pdf_pages(source: Union[str, bytes], page_numbers: Sequence[int], budget: Optional[int] = None,
+                     zoom: Optional[float] = None, max_pixels: Optional[int] = None) -> List[Tuple[str, float, float]]:
+    """
+    Render the given pages of a PDF to image data URLs. Runs inside a pool worker.
+    Returns (data_url, render_seconds, encode_seconds) per page.
+    """
+    return list(iter_pdf_pages(source, page_numbers, budget, zoom, max_pixels))
+
+
+def encode_docx_image(image_data: bytes, max_dim: int = 1024, budget: Optional[int] = None) -> Tuple[str, float]:
+    """Downscale and encode an embedded DOCX image to a data URL. Runs inside a pool worker."""
+    from image_encoding import encode_source_image
+
+    start = time.perf_counter()
+    data_url = encode_source_image(image_data, max_dim, budget)
+    return data_url, time.perf_counter() - start
+
+
+def render_pages(source: Union[str, bytes], page_numbers: Sequence[int], budget: Optional[int] = None,
+                 zoom: Optional[float] = None) -> Iterator[str]:
+    """
+    Render pages of one document in parallel across the pool, yielding data URLs in page order.
+    At most one task per worker is in flight, so finished pages don't pile up ahead of the consumer.
+    """
+    page_numbers = list(page_numbers)
+    pool = get_render_pool()
+    if pool is None or not page_numbers:
+        yield from _observe_pages(iter_pdf_pages(source, page_numbers, budget, zoom, max_page_pixels(1)))
+        return
+    if isinstance(source, (bytes, bytearray)):
+        # Every task would otherwise pickle the whole document and each worker hold a copy;
+        # from a file, MuPDF reads only the pages it renders
+        with tempfile.NamedTemporaryFile(prefix="render-", suffix=".pdf") as spooled:
+            spooled.write(source)
+            spooled.flush()
+            yield from _render_in_pool(pool, spooled.name, page_numbers, budget, zoom)
+        return
+    yield from _render_in_pool(pool, source, page_numbers, budget, zoom)
+
+
+def _render_in_pool(pool, source: str, page_numbers: List[int], budget: Optional[int],
+                    zoom: Optional[float]) -> Iterator[str]:
+    # Spread pages over every worker, but cap how many a single task renders
+    chunk_size = max(1, min(RENDER_PAGES_PER_TASK, -(-len(page_numbers) // RENDER_POOL_WORKERS)))
+    chunks = [
+        page_numbers[i:i + chunk_size]
+        for i in range(0, len(page_numbers), chunk_size)
+    ]
+    in_flight = min(RENDER_POOL_WORKERS, len(chunks))
+    max_pixels = max_page_pixels(in_flight)
+    futures = [pool.submit(render_pdf_pages, source, chunk, budget, zoom, max_pixels) for chunk in chunks[:in_flight]]
+    next_chunk = in_flight
+    while futures:
+        encoded_pages = futures.pop(0).result()
+        if next_chunk < len(chunks):
+            futures.append(pool.submit(render_pdf_pages, source, chunks[next_chunk], budget, zoom, max_pixels))
+            next_chunk += 1
+        yield from _observe_pages(encoded_pages)
+
+
+def encode_images(images: Sequence[bytes], max_dim: int = 1024, budget: Optional[int] = None) -> List[str]:
+    """Encode DOCX images in parallel across the pool, preserving order."""
+    pool = get_render_pool()
+    if pool is None or not images:
+        encoded_images = [encode_docx_image(image_data, max_dim, budget) for image_data in images]
+    else:
+        encoded_images = list(pool.map(encode_docx_image, images, [max_dim] * len(images), [budget] * len(images)))
+    for _, encode_seconds in encoded_images:
+        metrics.ENCODE_SECONDS.observe(encode_seconds)
+    return [data_url for data_url, _ in encoded_images]
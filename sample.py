@@ -1,11 +1,11 @@
 import logging
-import requests
 from fastapi import FastAPI, Request
 from psycopg2.extras import RealDictCursor
-import psycopg2
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+from bland_client import BlandClient
+from db_pool import ConnectionPool
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,43 +17,34 @@ PATHWAY_ID = os.getenv('PATHWAY_ID')
 CALL_URL = os.getenv('CALL_URL')
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 
+# Shared, pooled connections to the Bland API and the database
+bland_client = BlandClient(api_key=BLAND_API_KEY, calls_url=CALL_URL)
+db_pool = ConnectionPool(DATABASE_URL, connect_timeout=10)
+
 # FastAPI app
 app = FastAPI()
 
-# Database connection helper
-def get_database_connection():
-    try:
-        conn = psycopg2.connect(
-            DATABASE_URL,
-            connect_timeout=10
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"Database connection error: {e}")
-        raise
+
+@app.on_event("shutdown")
+async def close_connections():
+    await bland_client.aclose()
+    db_pool.close()
 
 # Fetch data from the database
 def fetch_person_data():
-    conn = get_database_connection()
-    if not conn:
-        logging.error("Database connection failed")
-        return []
     try:
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        cursor.execute("""
-            SELECT id, full_name, sms_phone_numbers_used, job_title, location, estimated_pay
-            FROM person_details_dummy
-            WHERE sms_phone_numbers_used IS NOT NULL AND sms_phone_numbers_used != ''
-        """)
-        results = cursor.fetchall()
+        with db_pool.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT id, full_name, sms_phone_numbers_used, job_title, location, estimated_pay
+                FROM person_details_dummy
+                WHERE sms_phone_numbers_used IS NOT NULL AND sms_phone_numbers_used != ''
+            """)
+            results = cursor.fetchall()
         logging.info(f"Fetched {len(results)} records from the database")
         return results
     except Exception as e:
         logging.error(f"Error fetching data: {e}")
         return []
-    finally:
-        cursor.close()
-        conn.close()
 
 # Make a call using Bland AI
 def make_call(person):
@@ -78,15 +69,7 @@ def make_call(person):
             }
         }
 
-        response = requests.post(
-            CALL_URL,
-            json=data,
-            headers={
-                "Authorization": f"Bearer {BLAND_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            timeout=30
-        )
+        response = bland_client.start_call(data)
         response.raise_for_status()
         if response.status_code == 200:
             call_id = response.json().get('call_id')
@@ -100,20 +83,16 @@ def make_call(person):
         return None
 
 # Analyze call intent
-def analyze_call_intent(call_id):
+async def analyze_call_intent(call_id):
     try:
-        response = requests.post(
-            f"{CALL_URL}/{call_id}/analyze",
-            json={
+        response = await bland_client.aanalyze_call(
+            call_id,
+            {
                 "goal": "Analyze caller's response to job opportunity",
                 "questions": [[
                     "Based on the caller's response, categorize their interest: Answer 'yes' if genuinely interested in the job, 'no' if not interested/declined, or 'later' if they said they're busy/call later/call back later/will call you back",
                     "string"
                 ]]
-            },
-            headers={
-                "Authorization": f"Bearer {BLAND_API_KEY}",
-                "Content-Type": "application/json"
             }
         )
         if response.status_code == 200:
@@ -126,12 +105,9 @@ def analyze_call_intent(call_id):
         return "error"
 
 # Get call summary
-def get_call_summary(call_id):
+async def get_call_summary(call_id):
     try:
-        response = requests.get(
-            f"{CALL_URL}/{call_id}",
-            headers={"Authorization": f"Bearer {BLAND_API_KEY}"}
-        )
+        response = await bland_client.aget_call(call_id)
         return response.json().get("summary", "No summary available.") if response.status_code == 200 else "Error fetching summary."
     except Exception as e:
         logging.error(f"Exception while getting summary: {e}")
@@ -147,8 +123,8 @@ async def webhook(request: Request):
         if call_id:
             logging.info(f"Webhook received for call_id: {call_id}, phone_number: {phone_number}")
             # Analyze call intent and get summary
-            intent = analyze_call_intent(call_id)
-            summary = get_call_summary(call_id)
+            intent = await analyze_call_intent(call_id)
+            summary = await get_call_summary(call_id)
             return {
                 "message": "Webhook processed successfully",
                 "call_id": call_id,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 class EmailSchema(BaseModel):
@@ -27,4 +27,25 @@ class MultiProcessResponse(BaseModel):
     total_files: int
     successful_files: int
     failed_files: int
-    errors: List[str] = []
\ No newline at end of file
+    errors: List[str] = []
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    total_files: int
+
+
+class JobFileStatus(BaseModel):
+    filename: str
+    status: str
+    error: Optional[str] = None
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    total_files: int
+    completed_files: int
+    successful_files: int
+    failed_files: int
+    files: List[JobFileStatus]
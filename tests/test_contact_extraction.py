@@ -0,0 +1,36 @@
+import pytest
+
+from contact_extraction import extract_contact_fields, missing_fields
+
+
+def test_name_corroborated_by_email():
+    fields = extract_contact_fields("Jane Doe, RN\nPhoenix AZ\njane.doe@gmail.com\n(602) 555-0142")
+    assert fields["full_name"] == "Jane Doe"
+    assert fields["phone_number"] == "(602) 555-0142"
+
+
+@pytest.mark.parametrize("first_line", ["Software Engineer", "Work History", "Phoenix AZ"])
+def test_headings_titles_and_cities_are_not_names(first_line):
+    fields = extract_contact_fields(f"{first_line}\nJohn Smith\njane.doe@gmail.com")
+    assert "full_name" not in fields
+
+
+def test_name_without_email_is_left_to_the_llm():
+    fields = extract_contact_fields("Jane Doe\n(602) 555-0142")
+    assert "full_name" not in fields
+    assert "full_name" in missing_fields(fields, ["full_name", "phone_number"])
+
+
+@pytest.mark.parametrize("email", ["jdoe@x.com", "doe.jane@x.com", "janedoe42@x.com"])
+def test_common_email_shapes_corroborate(email):
+    assert extract_contact_fields(f"JANE DOE\n{email}")["full_name"] == "Jane Doe"
+
+
+@pytest.mark.parametrize("text", ["2015 2016 2017", "2015\n2016\n2017", "Worked 2015-2019\n555 1234"])
+def test_years_and_lines_are_not_phone_numbers(text):
+    assert "phone_number" not in extract_contact_fields(text)
+
+
+@pytest.mark.parametrize("phone", ["+1 602.555.0142", "602-555-0142", "(602) 555-0142", "+44 20 7946 0958"])
+def test_phone_numbers(phone):
+    assert extract_contact_fields(f"Phone: {phone}")["phone_number"] == phone
@@ -0,0 +1,37 @@
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from image_encoding import _save, encode_source_image
+
+
+def encoded(image, fmt, **kwargs):
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def decode(data_url):
+    header, data = data_url.split(",", 1)
+    return header, Image.open(BytesIO(base64.b64decode(data)))
+
+
+def test_transparent_areas_become_white_in_lossy_formats():
+    transparent = Image.new("RGBA", (40, 40), (0, 0, 0, 0))
+    for fmt in ("JPEG", "WEBP"):
+        pixel = Image.open(BytesIO(_save(transparent, fmt, 80))).convert("RGB").getpixel((20, 20))
+        assert min(pixel) > 240
+
+
+def test_animated_gif_is_reencoded():
+    frames = [Image.new("RGB", (20, 20), color) for color in ("red", "blue")]
+    data = encoded(frames[0], "GIF", save_all=True, append_images=frames[1:])
+    header, image = decode(encode_source_image(data))
+    assert header.startswith("data:image/png")
+    assert not getattr(image, "is_animated", False)
+
+
+def test_small_png_passes_through_unchanged():
+    data = encoded(Image.new("RGB", (20, 20), "white"), "PNG")
+    assert encode_source_image(data) == "data:image/png;base64," + base64.b64encode(data).decode()
@@ -0,0 +1,84 @@
+import pytest
+
+from intent_classifier import INTENT_MIN_CONFIDENCE, IntentClassifier, NaiveBayesIntentModel
+
+
+@pytest.fixture
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("transcript, label", [
+    ("assistant: Would you be interested?\nuser: That sounds great, tell me more.", "yes"),
+    ("user: I'd love to hear more about it.", "yes"),
+    ("user: I'm not interested, thanks.", "no"),
+    ("user: I would like to be removed from your list.", "no"),
+    ("user: Please take me off your list.", "no"),
+    ("user: I'm driving, call me back later.", "later"),
+])
+def test_strong_phrases_are_confident(classifier, transcript, label):
+    prediction = classifier.classify(transcript)
+    assert prediction.label == label
+    assert prediction.confidence >= INTENT_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("transcript", [
+    "user: yeah sure whatever, who is this?",
+    "user: Yes.",
+    "user: yeah, yep, sure, absolutely",
+    "user: I'm not sure, I'd like to think about it.",
+    "user: Sounds good, but I don't know.",
+])
+def test_weak_or_hedged_answers_go_to_remote(classifier, transcript):
+    assert classifier.classify(transcript).confidence < INTENT_MIN_CONFIDENCE
+
+
+def test_i_would_like_to_is_not_a_yes(classifier):
+    assert classifier.classify("user: I would like to be removed from your list").label != "yes"
+    assert classifier.classify("user: I'm not sure, I'd like to think about it").label != "yes"
+
+
+def test_only_the_caller_side_counts(classifier):
+    transcript = "assistant: Are you interested? It sounds great.\nuser: No thank you."
+    assert classifier.classify(transcript).label == "no"
+
+
+def test_empty_transcript_is_unknown(classifier):
+    assert classifier.classify("") == ("unknown", 0.0, "rules")
+
+
+TRAINING = [
+    ("user: what's the pay rate on that", "yes"),
+    ("user: what's the pay and the shift", "yes"),
+    ("user: hmm no", "no"),
+]
+
+
+def test_model_answers_when_rules_are_not_decisive():
+    model = NaiveBayesIntentModel.train(TRAINING)
+    model.calibrate([("user: what's the pay", "yes"), ("user: what's the shift pay", "yes")], min_support=2)
+    prediction = IntentClassifier(model).classify("user: what's the pay")
+    assert prediction == (prediction.label, prediction.confidence, "model")
+    assert prediction.label == "yes"
+
+
+def test_uncalibrated_model_is_never_confident():
+    model = NaiveBayesIntentModel.train(TRAINING)
+    assert model.predict("what's the pay")[1] >= INTENT_MIN_CONFIDENCE
+    assert IntentClassifier(model).classify("user: what's the pay").confidence < INTENT_MIN_CONFIDENCE
+
+
+def test_calibration_reports_holdout_accuracy():
+    model = NaiveBayesIntentModel.train(TRAINING)
+    # Half of the held out calls the model is sure about are wrong
+    model.calibrate([("user: what's the pay", "yes"), ("user: what's the pay", "no")], min_support=2)
+    assert model.calibrated_confidence(model.predict("what's the pay")[1]) == 0.5
+    assert IntentClassifier(model).classify("user: what's the pay").confidence < INTENT_MIN_CONFIDENCE
+
+
+def test_calibration_survives_save_and_load(tmp_path):
+    model = NaiveBayesIntentModel.train(TRAINING)
+    model.calibrate([("user: what's the pay", "yes")], min_support=1)
+    path = str(tmp_path / "model.json")
+    model.save(path)
+    assert NaiveBayesIntentModel.load(path).calibration == model.calibration
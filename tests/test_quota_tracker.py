@@ -0,0 +1,81 @@
+import time
+
+from quota_tracker import QuotaTracker, SlidingWindowQuota
+
+
+def tracker_with(rows):
+    tracker = QuotaTracker(reconcile_seconds=0)
+    tracker.register("daily", 3, loader=lambda: list(rows))
+    return tracker
+
+
+def test_reconcile_does_not_count_a_dial_twice():
+    rows = []
+    tracker = tracker_with(rows)
+    assert tracker.try_acquire("daily")
+    # The database records the same call, bucketed by its own created_at
+    rows.append((time.time() - 120, 1))
+    tracker.reconcile()
+    assert tracker.count("daily") == 1
+
+
+def test_usage_after_the_load_started_is_kept():
+    quota = SlidingWindowQuota(10)
+    loaded_at = time.time()
+    quota.add(1)
+    quota.merge([(loaded_at - 600, 2)], loaded_at)
+    assert quota.count() == 3
+
+
+def test_source_of_truth_replaces_older_usage():
+    quota = SlidingWindowQuota(10)
+    quota.add(1, time.time() - 30)
+    quota.merge([], time.time())
+    assert quota.count() == 0
+
+
+def test_release_only_refunds_unreconciled_usage():
+    rows = []
+    tracker = tracker_with(rows)
+    assert tracker.try_acquire("daily")
+    tracker.release("daily")
+    assert tracker.count("daily") == 0
+    rows.append((time.time(), 2))
+    tracker.reconcile()
+    # Nothing acquired since the load, so a stray release cannot undercount the database
+    tracker.release("daily")
+    assert tracker.count("daily") == 2
+
+
+def test_acquire_is_all_or_nothing():
+    tracker = QuotaTracker(reconcile_seconds=0)
+    tracker.register("daily", 1)
+    tracker.register("pathway", 5)
+    assert tracker.try_acquire("daily", "pathway")
+    assert not tracker.try_acquire("daily", "pathway")
+    assert tracker.count("pathway") == 1
+
+
+def test_failed_load_is_not_retried_on_every_acquire():
+    attempts = []
+
+    def loader():
+        attempts.append(1)
+        raise ConnectionError("database unreachable")
+
+    tracker = QuotaTracker(reconcile_seconds=0)
+    tracker.register("daily", 100, loader=loader)
+    for _ in range(5):
+        assert tracker.try_acquire("daily")
+    assert len(attempts) == 1
+    assert tracker.count("daily") == 5
+
+
+def test_near_the_limit_usage_from_other_processes_is_read_first():
+    rows = []
+    tracker = QuotaTracker(reconcile_seconds=0, sync_margin=2)
+    tracker.register("daily", 3, loader=lambda: list(rows))
+    assert tracker.try_acquire("daily")
+    # The database has this process's call and two placed by another worker
+    rows.append((time.time() - 60, 3))
+    assert not tracker.try_acquire("daily")
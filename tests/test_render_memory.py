@@ -0,0 +1,96 @@
+import os
+import time
+import random
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+SCANNED_PAGES = 40
+
+
+def scanned_pdf(pages: int) -> bytes:
+    """Image-only pages of JPEG noise, the worst case for the renderer."""
+    import fitz
+    from PIL import Image
+
+    random.seed(0)
+    pdf_document = fitz.open()
+    for _ in range(pages):
+        noise = Image.frombytes("RGB", (600, 800), random.randbytes(600 * 800 * 3))
+        buffer = BytesIO()
+        noise.save(buffer, format="JPEG", quality=90)
+        page = pdf_document.new_page()
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    return pdf_document.tobytes()
+
+
+def _high_water_kb(pid="self") -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmHWM not reported")
+
+
+def _reset_high_water(pid="self"):
+    with open(f"/proc/{pid}/clear_refs", "w") as f:
+        f.write("5")
+
+
+def _warm_up_worker():
+    # Imports count towards a worker's baseline, not the document it renders
+    import fitz  # noqa: F401
+    import image_encoding  # noqa: F401
+    time.sleep(0.5)
+
+
+def process_scan_in_fresh_process(pdf_bytes: bytes, workers: int):
+    """
+    Runs in its own process: peak RSS growth (MB) of this process and its render workers while
+    process_pdf handles the scan, the budget and page cap in force, and the image pages sent.
+    """
+    # utils builds its LLM client at import; nothing is sent, and the disk cache stays off
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    os.environ["EXTRACTION_CACHE_PATH"] = ""
+    import utils
+    import render_pool
+
+    render_pool.RENDER_POOL_WORKERS = workers
+    sent = []
+    utils.complete_extraction = lambda parts, *args, **kwargs: sent.extend(parts) or "{}"
+    pool = render_pool.get_render_pool()
+    worker_pids = []
+    if pool is not None:
+        for future in [pool.submit(_warm_up_worker) for _ in range(workers)]:
+            future.result()
+        worker_pids = list(pool._processes)
+    pids = ["self"] + worker_pids
+    for pid in pids:
+        _reset_high_water(pid)
+    baselines = {pid: _high_water_kb(pid) for pid in pids}
+    try:
+        utils.process_pdf(pdf_bytes)
+        # Peaks are summed as if they coincided, which overstates the real total
+        growth_mb = sum(_high_water_kb(pid) - baselines[pid] for pid in pids) / 1024
+    finally:
+        render_pool.shutdown_render_pool()
+    image_pages = sum(1 for part in sent if part["type"] == "image_url")
+    return (growth_mb, render_pool.RENDER_MEMORY_BUDGET / 1024 / 1024, utils.PDF_MAX_RENDER_PAGES,
+            image_pages, len(sent))
+
+
+@pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK), reason="needs Linux /proc high-water reset")
+@pytest.mark.parametrize("workers", [0, 2], ids=["inline", "pooled"])
+def test_scanned_pdf_stays_within_render_budget_and_page_cap(workers):
+    pdf_bytes = scanned_pdf(SCANNED_PAGES)
+    # Executor workers may start the render pool's own processes, unlike daemonic Pool workers
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        growth_mb, limit_mb, page_cap, image_pages, parts = executor.submit(
+            process_scan_in_fresh_process, pdf_bytes, workers).result()
+
+    assert growth_mb <= limit_mb
+    assert image_pages == min(SCANNED_PAGES, page_cap)
+    # Skipped scanned pages have no text layer, so nothing else is sent for them
+    assert parts == image_pages
@@ -0,0 +1,51 @@
+import pytest
+
+from write_behind import WriteBehindBuffer
+
+
+class Unavailable(ConnectionError):
+    pass
+
+
+def buffer_at(tmp_path, handler, **kwargs):
+    return WriteBehindBuffer(str(tmp_path / "buffer.sqlite3"), handler, batch_size=10, **kwargs)
+
+
+def test_rejected_records_are_set_aside_and_the_rest_written(tmp_path):
+    written = []
+
+    def handler(records):
+        if any(record["bad"] for record in records):
+            raise ValueError("invalid input syntax")
+        written.extend(record["id"] for record in records)
+
+    buffer = buffer_at(tmp_path, handler)
+    for i in range(6):
+        buffer.add(str(i), {"id": i, "bad": i == 4})
+    assert buffer.flush_once() == 6
+    assert sorted(written) == [0, 1, 2, 3, 5]
+    assert buffer.pending() == 0
+    assert buffer.failed() == 1
+
+
+def test_transient_errors_keep_the_batch(tmp_path):
+    def handler(records):
+        raise Unavailable("server closed the connection")
+
+    buffer = buffer_at(tmp_path, handler)
+    buffer.add("a", {"id": 1})
+    with pytest.raises(Unavailable):
+        buffer.flush_once()
+    assert buffer.pending() == 1
+    assert buffer.failed() == 0
+
+
+def test_nothing_is_flushed_until_prepared(tmp_path):
+    written = []
+    buffer = buffer_at(tmp_path, written.extend, prepare=lambda: False)
+    buffer.add("a", {"id": 1})
+    buffer.start()
+    buffer.stop()
+    assert written == []
+    # Still on disk for the next start
+    assert buffer_at(tmp_path, written.extend).pending() == 1
@@ -6,14 +6,19 @@ from schema import EmailSchema, JobApplication
 import re
 import json
 import time
-import base64
-from typing import Dict, Any
-from PIL import Image
+import docx
+from typing import Dict, Any, List, Optional, Union, BinaryIO
 from io import BytesIO
 import fitz  # PyMuPDF
+import metrics
 from langchain.schema import HumanMessage, SystemMessage
-from config import SYSTEM_PROMPT
+from contact_extraction import extract_contact_fields, missing_fields, build_system_prompt
+from extraction_cache import extraction_cache, make_cache_key
+from render_pool import render_pages, encode_images
+from image_encoding import per_image_budget
 from langchain_openai import ChatOpenAI
+from llm_gateway import LLMGateway
+from bland_client import bland_client
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,10 +29,23 @@ logger = logging.getLogger(__name__)
 llm = ChatOpenAI(
     api_key=OPENAI_API_KEY,
     temperature=0.7,
-    model="gpt-4o-mini"
+    model="gpt-4o-mini",
+    max_retries=0  # the gateway owns retries so it can honour Retry-After
 )
 logger.info("LLM initialized with model: gpt-4o-mini")
 
+# All extraction calls go through the gateway for RPM/TPM budgeting
+llm_gateway = LLMGateway(llm)
+
+# "text_first" sends the PDF text layer and rasterizes only sparse pages, "image" renders every page
+PDF_EXTRACTION_MODE = os.getenv("PDF_EXTRACTION_MODE", "text_first")
+# Pages with fewer extracted characters than this are treated as image-only
+PDF_MIN_PAGE_TEXT_CHARS = int(os.getenv("PDF_MIN_PAGE_TEXT_CHARS", "100"))
+# Most pages rasterized per PDF; past this only the most informative pages are sent, 0 renders all
+PDF_MAX_RENDER_PAGES = int(os.getenv("PDF_MAX_RENDER_PAGES", "8"))
+# Rough compressed scan bytes a character of page text is worth when ranking pages
+TEXT_CHAR_WEIGHT = 20
+
 
 
 def send_job_application_email(email: EmailSchema) -> dict:
@@ -124,14 +142,13 @@ Automated Application System
         return {"error": str(e)}
 
 
-def process_job_application(application: JobApplication) -> dict:
+async def process_job_application(application: JobApplication) -> dict:
     BLAND_API_KEY = os.environ.get("BLAND_API_KEY")
     PATHWAY_ID = os.environ.get("PATHWAY_ID")
 
     if not BLAND_API_KEY or not PATHWAY_ID:
         raise ValueError("Missing BLAND_API_KEY or PATHWAY_ID")
 
-    url = "https://api.bland.ai/v1/calls"
     data = {
         "phone_number": application.phone_number,
         "pathway_id": PATHWAY_ID,
@@ -149,12 +166,7 @@ def process_job_application(application: JobApplication) -> dict:
         }
     }
 
-    headers = {
-        "Authorization": f"Bearer {BLAND_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    response = requests.post(url, json=data, headers=headers)
+    response = await bland_client.astart_call(data)
 
     if response.status_code in (200, 202):
         return {"message": "Call initiated", "response": response.json()}
@@ -162,6 +174,7 @@ def process_job_application(application: JobApplication) -> dict:
         logger.error(f"Call failed: {response.status_code} - {response.text}")
         raise Exception(f"Call failed with status {response.status_code}")
     
+@metrics.PARSE_SECONDS.time()
 def extract_json_from_content(content: str) -> Dict[str, Any]:
     """Extract JSON object from content string that might contain markdown code blocks."""
     logger.info("Extracting JSON from content")
@@ -191,13 +204,116 @@ def extract_json_from_content(content: str) -> Dict[str, Any]:
         logger.info("Returning raw content wrapped in dictionary")
         return {"raw_content": content}
 
-def process_pdf(pdf_path):
-    logger.info(f"Processing PDF: {pdf_path}")
+def read_source(source: Union[str, bytes, BinaryIO]) -> Union[str, bytes]:
+    """Documents come in as a path, raw bytes or a binary stream; streams are read into memory."""
+    if hasattr(source, "read"):
+        source.seek(0)
+        return source.read()
+    return source
+
+
+def describe_source(source: Union[str, bytes]) -> str:
+    return source if isinstance(source, str) else f"<{len(source)} bytes in memory>"
+
+
+def page_information_score(pdf_document, page, page_text: str) -> int:
+    """
+    How much content a page carries, from its text layer and the compressed size of its images.
+    Blank or near-blank scans compress to almost nothing, so they rank last.
+    """
+    image_bytes = 0
+    for image in page.get_images():
+        kind, length = pdf_document.xref_get_key(image[0], "Length")
+        if kind == "int":
+            image_bytes += int(length)
+    return image_bytes + TEXT_CHAR_WEIGHT * len(page_text)
+
+
+def select_pages(page_scores: Dict[int, int], max_pages: int = PDF_MAX_RENDER_PAGES) -> List[int]:
+    """Keep the first page, which carries the contact details, plus the highest scoring others, in page order."""
+    page_numbers = sorted(page_scores)
+    if max_pages <= 0 or len(page_numbers) <= max_pages:
+        return page_numbers
+    ranked = sorted(page_numbers[1:], key=lambda page_num: (-page_scores[page_num], page_num))
+    return sorted([page_numbers[0]] + ranked[:max_pages - 1])
+
+
+def failure_type(error: str) -> str:
+    """Low-cardinality label for an "Error: ..." result string."""
+    if "from LLM" in error or "not a string" in error:
+        return "llm_response"
+    if error.startswith("Error processing"):
+        return "processing_exception"
+    return "empty_document"
+
+
+def plan_extraction(document_text: str, fields: Optional[List[str]] = None):
+    """Fill what we can from the text layer; returns the local fields and the fields left for the LLM."""
+    local_fields = extract_contact_fields(document_text) if document_text else {}
+    if fields:
+        local_fields = {key: value for key, value in local_fields.items() if key in fields}
+    remaining_fields = missing_fields(local_fields, fields)
+    logger.info(f"Found {sorted(local_fields)} locally, {len(remaining_fields)} fields left for the LLM")
+    return local_fields, remaining_fields
+
+
+def complete_extraction(content_parts, local_fields: Dict[str, str], remaining_fields: List[str],
+                        fields: Optional[List[str]] = None) -> str:
+    """
+    Ask the LLM for the remaining fields only and merge in the local ones.
+    Returns the extraction as JSON text, or an "Error: ..." string.
+    """
+    # Create message and send to LLM
+    logger.info("Sending request to OpenAI API")
+    api_start_time = time.time()
+
+    messages = [
+        SystemMessage(content=build_system_prompt(remaining_fields)),
+        HumanMessage(content=content_parts)
+    ]
+
+    response = llm_gateway.invoke(messages, timeout=120)
+
+    api_duration = time.time() - api_start_time
+    logger.info(f"OpenAI API response received in {api_duration:.2f} seconds")
+
+    # Validate response
+    if not response or not hasattr(response, 'content'):
+        logger.error("Invalid response from LLM")
+        return "Error: Invalid response from LLM."
+    if not response.content:
+        logger.error("Empty response from LLM")
+        return "Error: Empty response from LLM."
+    if not isinstance(response.content, str):
+        logger.error("Response is not a string")
+        return "Error: Response is not a string."
+
+    if not local_fields and not fields:
+        return response.content
+
+    content_json = extract_json_from_content(response.content)
+    if "raw_content" in content_json:
+        return response.content
+    content_json = normalize_keys(content_json)
+    content_json.update(local_fields)
+    if fields:
+        content_json = {key: value for key, value in content_json.items() if key in fields}
+    return json.dumps(content_json)
+
+
+def process_pdf(pdf_source, mode=None, fields=None):
+    mode = mode or PDF_EXTRACTION_MODE
+    pdf_source = read_source(pdf_source)
+    logger.info(f"Processing PDF: {describe_source(pdf_source)} (mode: {mode})")
     start_time = time.time()
 
     try:
-        # Open the PDF
-        pdf_document = fitz.open(pdf_path)
+        # Open the PDF, straight from memory when we have the bytes
+        with metrics.OPEN_SECONDS.time():
+            if isinstance(pdf_source, (bytes, bytearray)):
+                pdf_document = fitz.open(stream=pdf_source, filetype="pdf")
+            else:
+                pdf_document = fitz.open(pdf_source)
         if len(pdf_document) == 0:
             logger.error("PDF contains no pages")
             return "Error: PDF contains no pages."
@@ -206,67 +322,87 @@ def process_pdf(pdf_path):
         page_count = len(pdf_document)
         logger.info(f"Processing {page_count} pages")
 
-        all_page_images = []
+        all_page_parts = [None] * page_count
+        render_scores = {}
+        page_texts = []
+        document_text = []
         for page_num in range(page_count):
             page = pdf_document[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
-            base64_image = base64.b64encode(pix.tobytes()).decode("utf-8")
-
-            all_page_images.append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/png;base64,{base64_image}",
-                    "detail": "auto"
-                }
-            })
-
-            # Log progress for every 5 pages or the last page
-            if page_num % 5 == 0 or page_num == page_count - 1:
-                logger.info(f"Processed page {page_num + 1}/{page_count}")
+            page_text = page.get_text("text").strip()
+            page_texts.append(page_text)
+            document_text.append(page_text)
+            # Link targets carry mailto: and LinkedIn URLs that aren't always in the visible text
+            document_text.extend(link["uri"] for link in page.get_links() if link.get("uri"))
+
+            # Born-digital pages already carry their text, only rasterize image-only or sparse pages
+            if mode == "text_first":
+                if len(page_text) >= PDF_MIN_PAGE_TEXT_CHARS:
+                    all_page_parts[page_num] = {
+                        "type": "text",
+                        "text": f"Page {page_num + 1}:\n{page_text}"
+                    }
+                    continue
+            render_scores[page_num] = page_information_score(pdf_document, page, page_text)
 
         pdf_document.close()
-        logger.info("PDF document processed and closed")
-
-        # Create message and send to LLM
-        logger.info("Sending request to OpenAI API")
-        api_start_time = time.time()
-
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=all_page_images)
-        ]
-
-        response = llm.invoke(messages, timeout=120)
-
-        api_duration = time.time() - api_start_time
-        logger.info(f"OpenAI API response received in {api_duration:.2f} seconds")
+        pages_to_render = select_pages(render_scores)
+        if len(pages_to_render) < len(render_scores):
+            logger.info(f"Page cap reached, rasterizing {len(pages_to_render)} of {len(render_scores)} image pages")
+            metrics.PAGES.labels(source="skipped").inc(len(render_scores) - len(pages_to_render))
+            # Skipped pages still contribute whatever text layer they have
+            for page_num in set(render_scores) - set(pages_to_render):
+                if page_texts[page_num]:
+                    all_page_parts[page_num] = {
+                        "type": "text",
+                        "text": f"Page {page_num + 1}:\n{page_texts[page_num]}"
+                    }
+        metrics.PAGES.labels(source="text").inc(page_count - len(render_scores))
+        logger.info(f"PDF document scanned and closed, {len(pages_to_render)}/{page_count} pages to rasterize")
+
+        local_fields, remaining_fields = plan_extraction("\n".join(document_text), fields)
+        if not remaining_fields:
+            logger.info("All requested fields found in the text layer, skipping render and LLM call")
+            return json.dumps(local_fields)
+
+        # Rasterize and encode the remaining pages in parallel on the render pool; pages stream
+        # back in order and each pixmap is dropped as soon as its page is encoded
+        if pages_to_render:
+            render_start_time = time.time()
+            encoded_pages = render_pages(pdf_source, pages_to_render, budget=per_image_budget(len(pages_to_render)))
+            for page_num, image_url in zip(pages_to_render, encoded_pages):
+                all_page_parts[page_num] = {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url,
+                        "detail": "auto"
+                    }
+                }
+            metrics.PAGES.labels(source="rendered").inc(len(pages_to_render))
+            logger.info(f"Rendered {len(pages_to_render)} pages in {time.time() - render_start_time:.2f} seconds")
 
-        # Validate response
-        if not response or not hasattr(response, 'content'):
-            logger.error("Invalid response from LLM")
-            return "Error: Invalid response from LLM."
-        if not response.content:
-            logger.error("Empty response from LLM")
-            return "Error: Empty response from LLM."
-        if not isinstance(response.content, str):
-            logger.error("Response is not a string")
-            return "Error: Response is not a string."
+        all_page_parts = [part for part in all_page_parts if part is not None]
+        result = complete_extraction(all_page_parts, local_fields, remaining_fields, fields)
 
         process_duration = time.time() - start_time
         logger.info(f"PDF processing completed in {process_duration:.2f} seconds")
-        return response.content
+        return result
 
     except Exception as e:
         logger.exception(f"Error processing PDF: {str(e)}")
         return f"Error processing PDF: {str(e)}"
 
-def process_docx(docx_path):
-    logger.info(f"Processing DOCX: {docx_path}")
+def process_docx(docx_source, fields=None):
+    docx_source = read_source(docx_source)
+    logger.info(f"Processing DOCX: {describe_source(docx_source)}")
     start_time = time.time()
 
     try:
-        # Load DOCX
-        doc = docx.Document(docx_path)
+        # Load DOCX, straight from memory when we have the bytes
+        with metrics.OPEN_SECONDS.time():
+            if isinstance(docx_source, (bytes, bytearray)):
+                doc = docx.Document(BytesIO(docx_source))
+            else:
+                doc = docx.Document(docx_source)
         logger.info("DOCX file loaded")
 
         all_messages = []
@@ -282,33 +418,33 @@ def process_docx(docx_path):
         else:
             logger.warning("No text found in DOCX")
 
-        # Extract and encode images
-        image_count = 0
+        # Collect images, and hyperlink targets for the contact fields
+        image_blobs = []
+        link_targets = []
         for rel in doc.part._rels:
             rel_obj = doc.part._rels[rel]
-            if "image" in rel_obj.target_ref:
-                image_data = rel_obj.target_part.blob
-                image = Image.open(BytesIO(image_data))
+            if rel_obj.is_external:
+                if "hyperlink" in rel_obj.reltype:
+                    link_targets.append(rel_obj.target_ref)
+            elif "image" in rel_obj.target_ref:
+                image_blobs.append(rel_obj.target_part.blob)
 
-                # Resize image if too large (optional)
-                max_dim = 1024
-                if image.width > max_dim or image.height > max_dim:
-                    image.thumbnail((max_dim, max_dim))
+        local_fields, remaining_fields = plan_extraction("\n".join([full_text, *link_targets]), fields)
+        if not remaining_fields:
+            logger.info("All requested fields found in the DOCX text, skipping image encoding and LLM call")
+            return json.dumps(local_fields)
 
-                # Convert to base64
-                buffer = BytesIO()
-                image.save(buffer, format="PNG")
-                encoded_image = base64.b64encode(buffer.getvalue()).decode("utf-8")
+        # Encode images in parallel on the render pool
 
-                all_messages.append({
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{encoded_image}",
-                        "detail": "auto"
-                    }
-                })
-
-                image_count += 1
+        for image_url in encode_images(image_blobs, max_dim=1024, budget=per_image_budget(len(image_blobs))):
+            all_messages.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": image_url,
+                    "detail": "auto"
+                }
+            })
+        image_count = len(image_blobs)
 
         logger.info(f"Extracted {image_count} images from DOCX")
 
@@ -316,34 +452,11 @@ def process_docx(docx_path):
             logger.warning("No content extracted from DOCX")
             return "Error: No content found in DOCX."
 
-        # Create message and send to LLM
-        logger.info("Sending request to OpenAI API")
-        api_start_time = time.time()
-
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
-            HumanMessage(content=all_messages)
-        ]
-
-        response = llm.invoke(messages, timeout=120)
-
-        api_duration = time.time() - api_start_time
-        logger.info(f"OpenAI API response received in {api_duration:.2f} seconds")
-
-        # Validate response
-        if not response or not hasattr(response, 'content'):
-            logger.error("Invalid response from LLM")
-            return "Error: Invalid response from LLM."
-        if not response.content:
-            logger.error("Empty response from LLM")
-            return "Error: Empty response from LLM."
-        if not isinstance(response.content, str):
-            logger.error("Response is not a string")
-            return "Error: Response is not a string."
+        result = complete_extraction(all_messages, local_fields, remaining_fields, fields)
 
         process_duration = time.time() - start_time
         logger.info(f"DOCX processing completed in {process_duration:.2f} seconds")
-        return response.content
+        return result
 
     except Exception as e:
         logger.exception(f"Error processing DOCX: {str(e)}")
@@ -364,17 +477,17 @@ def normalize_keys(content_json):
         new_json[new_key] = v
     return new_json
 
-def process_single_file(file_path: str, filename: str) -> Dict[str, Any]:
-    """Process a single file and return structured result"""
+def process_single_file(file_source: Union[str, bytes, BinaryIO], filename: str,
+                        fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Process a single file (path, bytes or binary stream) and return structured result.
+    Pass fields (normalized keys) to extract only those; contact-only requests may skip the LLM.
+    """
     logger.info(f"Processing single file: {filename}")
 
     try:
-        # Determine file type and process accordingly
-        if filename.lower().endswith('.pdf'):
-            result = process_pdf(file_path)
-        elif filename.lower().endswith('.docx'):
-            result = process_docx(file_path)
-        else:
+        if not filename.lower().endswith(('.pdf', '.docx')):
+            metrics.FAILURES.labels(error_type="unsupported_file_type").inc()
             return {
                 "filename": filename,
                 "status": "error",
@@ -382,8 +495,32 @@ def process_single_file(file_path: str, filename: str) -> Dict[str, Any]:
                 "error": f"Unsupported file type: {filename}"
             }
 
+        file_source = read_source(file_source)
+        if isinstance(file_source, str):
+            with open(file_source, "rb") as f:
+                file_source = f.read()
+
+        # Repeat uploads of the same document skip rendering and the LLM call
+        cache_key = make_cache_key(file_source, PDF_EXTRACTION_MODE, ",".join(sorted(fields or [])))
+        cached_content = extraction_cache.get(cache_key)
+        if cached_content is not None:
+            logger.info(f"Extraction cache hit for {filename}")
+            return {
+                "filename": filename,
+                "status": "success",
+                "content": cached_content,
+                "error": None
+            }
+
+        # Determine file type and process accordingly
+        if filename.lower().endswith('.pdf'):
+            result = process_pdf(file_source, fields=fields)
+        else:
+            result = process_docx(file_source, fields=fields)
+
         # Check for processing errors
         if isinstance(result, str) and result.startswith("Error"):
+            metrics.FAILURES.labels(error_type=failure_type(result)).inc()
             return {
                 "filename": filename,
                 "status": "error",
@@ -400,6 +537,10 @@ def process_single_file(file_path: str, filename: str) -> Dict[str, Any]:
                 content_json["total_work_experience"] = f"{experience_value} years"
         # Normalize keys
         content_json = normalize_keys(content_json)
+        if "raw_content" in content_json:
+            metrics.FAILURES.labels(error_type="unparsed_response").inc()
+        else:
+            extraction_cache.set(cache_key, content_json)
         return {
             "filename": filename,
             "status": "success",
@@ -409,6 +550,7 @@ def process_single_file(file_path: str, filename: str) -> Dict[str, Any]:
 
     except Exception as e:
         logger.exception(f"Error processing file {filename}: {str(e)}")
+        metrics.FAILURES.labels(error_type=type(e).__name__).inc()
         return {
             "filename": filename,
             "status": "error",
@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+# How long a delivery is remembered in memory, and how many are kept at most
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", "3600"))
+WEBHOOK_DEDUP_MAX_ENTRIES = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "100000"))
+# Seconds a claimed delivery may stay in processing before another delivery may take it over
+WEBHOOK_DEDUP_LEASE_SECONDS = int(os.getenv("WEBHOOK_DEDUP_LEASE_SECONDS", "300"))
+# Days processed deliveries stay in the database table
+WEBHOOK_DEDUP_RETENTION_DAYS = int(os.getenv("WEBHOOK_DEDUP_RETENTION_DAYS", "7"))
+
+EventKey = Tuple[str, str]  # (call_id, event_type)
+
+
+class WebhookDeduplicator:
+    """
+    Makes webhook processing idempotent per (call_id, event type).
+
+    seen() is checked and set synchronously in the request, so retries and concurrent
+    duplicates stop there before any outbound HTTP or database work. claim() takes a
+    leased 'processing' row under that unique key before enrichment runs, and done()
+    marks it finished once the result is safely stored; a claim whose worker died or was
+    cancelled expires with its lease, so a redelivery is processed rather than dropped.
+    """
+
+    def __init__(self, db_pool, table: str = "webhook_events", ttl: int = WEBHOOK_DEDUP_TTL,
+                 max_entries: int = WEBHOOK_DEDUP_MAX_ENTRIES):
+        self.db_pool = db_pool
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._recent: "OrderedDict[EventKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create_table(self):
+        with self.db_pool.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    call_id TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (call_id, event_type)
+                );
+                ALTER TABLE {self.table}
+                    ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'done',
+                    ADD COLUMN IF NOT EXISTS lease_until TIMESTAMPTZ;
+                DELETE FROM {self.table}
+                WHERE received_at < NOW() - make_interval(days => {WEBHOOK_DEDUP_RETENTION_DAYS});
+            """)
+        logger.info(f"Webhook dedup table {self.table} ready")
+
+    def seen(self, key: EventKey) -> bool:
+        """True if this delivery was already accepted recently; otherwise remember it and return False."""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and next(iter(self._recent.values())) <= now:
+                self._recent.popitem(last=False)
+            expires_at = self._recent.get(key)
+            if expires_at is not None:
+                return True
+            self._recent[key] = now + self.ttl
+            if len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+            return False
+
+    def claim(self, key: EventKey, lease_seconds: int = WEBHOOK_DEDUP_LEASE_SECONDS) -> bool:
+        """
+        Take the delivery for processing; False if it is done, or still leased by another worker.
+        """
+        try:
+            with self.db_pool.cursor() as cursor:
+                cursor.execute(f"""
+                    INSERT INTO {self.table} (call_id, event_type, status, lease_until)
+                    VALUES (%s, %s, 'processing', NOW() + make_interval(secs => %s))
+                    ON CONFLICT (call_id, event_type) DO UPDATE
+                    SET status = 'processing', lease_until = EXCLUDED.lease_until, received_at = NOW()
+                    WHERE {self.table}.status = 'processing' AND {self.table}.lease_until < NOW()
+                """, (*key, lease_seconds))
+                return cursor.rowcount == 1
+        except Exception as e:
+            # The result writes are idempotent, so a lost claim costs API calls, not correctness
+            logger.error(f"Webhook dedup claim failed for {key}, processing anyway: {e}")
+            return True
+
+    def done(self, key: EventKey):
+        """Mark a claimed delivery processed; later deliveries of it are skipped."""
+        try:
+            with self.db_pool.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {self.table} SET status = 'done', lease_until = NULL WHERE call_id = %s AND event_type = %s",
+                    key
+                )
+        except Exception as e:
+            # The lease expires and a redelivery is processed again, which the idempotent writes allow
+            logger.error(f"Failed to mark webhook {key} done: {e}")
+
+    def forget(self, key: EventKey):
+        """Let a redelivery through again when an event was refused before it was claimed."""
+        with self._lock:
+            self._recent.pop(key, None)
+
+    def release(self, key: EventKey):
+        """Undo seen() and claim() after processing failed, so a retry of the event is processed."""
+        self.forget(key)
+        try:
+            with self.db_pool.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE call_id = %s AND event_type = %s", key)
+        except Exception as e:
+            logger.error(f"Failed to clear webhook dedup key {key}: {e}")
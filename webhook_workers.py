@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Webhook events enriched at the same time, and how many may wait before new ones are refused
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# Seconds shutdown waits for queued events to finish before cancelling them
+WEBHOOK_DRAIN_SECONDS = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "10"))
+# Times an event is requeued after an incomplete enrichment, first delay and longest delay
+WEBHOOK_RETRIES = int(os.getenv("WEBHOOK_RETRIES", "5"))
+WEBHOOK_RETRY_SECONDS = float(os.getenv("WEBHOOK_RETRY_SECONDS", "30"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "600"))
+
+WebhookHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class WebhookWorkers:
+    """
+    Bounded pool of asyncio tasks that process webhook events after the request has returned.
+
+    submit() never waits: it queues the event or reports the queue full, so the endpoint can
+    acknowledge Bland immediately and push back with a 503 only under real overload.
+    Bland never redelivers an acknowledged event, so the handler requeues one that could
+    not be completed with retry_later().
+    """
+
+    def __init__(self, handler: WebhookHandler, workers: int = WEBHOOK_WORKERS,
+                 max_pending: int = WEBHOOK_QUEUE_SIZE, max_retries: int = WEBHOOK_RETRIES):
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._delayed: Set[asyncio.Task] = set()
+        self._attempts: Dict[Hashable, int] = {}
+
+    def start(self):
+        """Start the workers on the running event loop; call from the app's startup hook."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._run(), name=f"webhook-worker-{i}") for i in range(self.workers)]
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        if self._queue is None:
+            raise RuntimeError("WebhookWorkers.start() has not been called")
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Webhook queue full ({self.max_pending} pending); refusing event")
+            return False
+
+    def retry_later(self, key: Hashable, event: Dict[str, Any]) -> Optional[float]:
+        """
+        Submit the event again after a delay that doubles per attempt; returns the delay,
+        or None once it has been retried max_retries times.
+        """
+        attempt = self._attempts.get(key, 0) + 1
+        if attempt > self.max_retries:
+            self._attempts.pop(key, None)
+            return None
+        self._attempts[key] = attempt
+        delay = min(WEBHOOK_RETRY_MAX_SECONDS, WEBHOOK_RETRY_SECONDS * 2 ** (attempt - 1))
+        task = asyncio.create_task(self._submit_after(event, delay))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+        return delay
+
+    def completed(self, key: Hashable):
+        """Forget the retries counted for an event that has now been processed."""
+        self._attempts.pop(key, None)
+
+    async def _submit_after(self, event: Dict[str, Any], delay: float):
+        await asyncio.sleep(delay)
+        if not self.submit(event):
+            logger.error(f"Dropping retry of webhook event for call {event.get('call_id')}, queue full")
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            try:
+                await self.handler(event)
+            except Exception:
+                logger.exception(f"Webhook event for call {event.get('call_id')} failed")
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, drain_seconds: float = WEBHOOK_DRAIN_SECONDS):
+        """Let queued events finish for up to drain_seconds, then cancel the workers."""
+        if not self._tasks:
+            return
+        if self._delayed:
+            logger.warning(f"Dropping {len(self._delayed)} webhook event retries still waiting at shutdown")
+            for task in self._delayed:
+                task.cancel()
+            await asyncio.gather(*self._delayed, return_exceptions=True)
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.pending} webhook events still queued at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
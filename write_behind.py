@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_PATH = os.getenv("WRITE_BEHIND_PATH", "call_results.sqlite3")
+# Records are flushed once this many are waiting, and at least every WRITE_BEHIND_FLUSH_MS
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "500"))
+# Longest pause between retries while the destination keeps failing
+WRITE_BEHIND_MAX_BACKOFF = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF", "60"))
+
+# Receives one batch, newest record per key; raising leaves the batch buffered for a retry
+FlushHandler = Callable[[List[Dict[str, Any]]], None]
+# Makes the destination ready (e.g. creates its schema); returns False or raises while it can't
+PrepareHandler = Callable[[], bool]
+
+
+class WriteBehindBuffer:
+    """
+    Durable local buffer in front of a slow or flaky database write.
+
+    add() appends the record to a SQLite WAL file and returns; a background thread hands
+    batches to flush_handler and deletes them only once it succeeds. Records left in the
+    file by a crash or an outage are replayed when the buffer starts again. The handler
+    must be idempotent: a crash between flush and delete replays that batch.
+
+    Errors of a transient_errors type (the destination is down) keep the batch for a
+    retry with backoff. Any other error splits the batch until the records that fail on
+    their own are found; those are moved to the failed_writes table and the rest written.
+    Nothing is flushed until prepare, if given, has succeeded.
+    """
+
+    def __init__(self, path: str, flush_handler: FlushHandler, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 flush_ms: int = WRITE_BEHIND_FLUSH_MS, name: str = "write-behind",
+                 transient_errors: Tuple[Type[BaseException], ...] = (OSError,),
+                 prepare: Optional[PrepareHandler] = None):
+        self.flush_handler = flush_handler
+        self.transient_errors = transient_errors
+        self.prepare = prepare
+        self._prepared = prepare is None
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000
+        self.name = name
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Survives a process crash; only an OS crash or power loss can lose the last commits
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pending_writes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                record TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS failed_writes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                record TEXT NOT NULL,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = self._db.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+        if self._pending:
+            logger.info(f"{self.name}: replaying {self._pending} buffered records from {path}")
+
+    def add(self, key: str, record: Dict[str, Any]):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO pending_writes (key, record, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(record, default=str), time.time())
+            )
+            self._db.commit()
+            self._pending += 1
+            full = self._pending >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._pending
+
+    def failed(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM failed_writes").fetchone()[0]
+
+    def _set_aside(self, key: str, record: Dict[str, Any], error: Exception):
+        logger.error(f"{self.name}: moving record {key} to failed_writes: {error}")
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO failed_writes (key, record, error, failed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(record, default=str), str(error), time.time())
+            )
+            self._db.commit()
+
+    def _write(self, items: List[Tuple[str, Dict[str, Any]]]):
+        """Hand items to flush_handler, halving the batch on a non-transient error to isolate bad records."""
+        try:
+            self.flush_handler([record for _, record in items])
+        except self.transient_errors:
+            raise
+        except Exception as e:
+            if len(items) == 1:
+                self._set_aside(*items[0], e)
+                return
+            middle = len(items) // 2
+            self._write(items[:middle])
+            self._write(items[middle:])
+
+    def flush_once(self) -> int:
+        """
+        Flush the oldest batch; returns records handled, including any set aside as failed.
+        Raises the transient errors flush_handler raised.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, key, record FROM pending_writes ORDER BY seq LIMIT ?", (self.batch_size,)
+            ).fetchall()
+        if not rows:
+            return 0
+        # Later records for the same key supersede earlier ones
+        latest = {key: json.loads(record) for _, key, record in rows}
+        self._write(list(latest.items()))
+        with self._lock:
+            self._db.execute("DELETE FROM pending_writes WHERE seq <= ?", (rows[-1][0],))
+            self._db.commit()
+            self._pending -= len(rows)
+        return len(rows)
+
+    def _prepare(self) -> bool:
+        try:
+            self._prepared = bool(self.prepare())
+        except Exception as e:
+            logger.error(f"{self.name}: preparing the destination failed: {e}")
+        return self._prepared
+
+    def _run(self):
+        backoff = 0.0
+        while not self._stop.is_set():
+            if backoff:
+                self._stop.wait(backoff)
+            else:
+                self._wake.wait(self.flush_seconds)
+                self._wake.clear()
+            if not self._prepared and not self._prepare():
+                backoff = min(WRITE_BEHIND_MAX_BACKOFF, max(self.flush_seconds, backoff * 2))
+                logger.error(f"{self.name}: destination not ready, {self.pending()} records buffered, "
+                             f"retrying in {backoff:.1f}s")
+                continue
+            try:
+                # Drain while full batches keep coming
+                while self.flush_once() >= self.batch_size and not self._stop.is_set():
+                    pass
+                backoff = 0.0
+            except Exception as e:
+                backoff = min(WRITE_BEHIND_MAX_BACKOFF, max(self.flush_seconds, backoff * 2))
+                logger.error(f"{self.name}: flush failed, {self.pending()} records buffered, retrying in {backoff:.1f}s: {e}")
+
+    def start(self):
+        """Prepare the destination, then start the flusher; if preparing fails the flusher retries it."""
+        if self._thread is None:
+            if not self._prepared:
+                self._prepare()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and try one last flush; whatever fails stays on disk for the next start."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            while self._prepared and self.flush_once():
+                pass
+        except Exception as e:
+            logger.error(f"{self.name}: final flush failed, {self.pending()} records kept for replay: {e}")
+        with self._lock:
+            self._db.close()